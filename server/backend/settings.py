@@ -3,6 +3,7 @@ from datetime import timedelta
 from dotenv import load_dotenv
 import dj_database_url
 import os
+import sys
 
 load_dotenv()
 
@@ -32,17 +33,20 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'django_filters',
     'investments_api',
     'guardian',
     'rest_framework_simplejwt',
 ]
 
 MIDDLEWARE = [
+    'investments_api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'investments_api.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -81,6 +85,21 @@ DATABASES = {
 
 DATABASES["default"] = dj_database_url.parse(os.environ.get("DATABASE_URL"))
 
+# transaction shards (comma-separated database URLs): each account's transactions and
+# outbox events live on one shard, picked by a stable hash of the account id
+TRANSACTION_SHARD_URLS = [url for url in os.environ.get('TRANSACTION_SHARD_URLS', '').split(',') if url]
+for index, url in enumerate(TRANSACTION_SHARD_URLS):
+    DATABASES[f'shard_{index}'] = dj_database_url.parse(url)
+
+TRANSACTION_SHARDS = [f'shard_{index}' for index in range(len(TRANSACTION_SHARD_URLS))] or ['default']
+
+# manage.py test: two SQLite shards for test_sharding, which switches sharding on with
+# override_settings(TRANSACTION_SHARDS=...); every other test runs unsharded
+if not TRANSACTION_SHARD_URLS and sys.argv[1:2] == ['test']:
+    for index in range(2):
+        DATABASES[f'shard_{index}'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / f'shard_{index}.sqlite3'}
+DATABASE_ROUTERS = ['investments_api.routers.TransactionShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,10 +157,81 @@ REST_FRAMEWORK = {
     #     'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     # ]
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'investments_api.authentication.CachedJWTAuthentication',
+    ),
+    # picked by content negotiation (Accept header or ?format=json|msgpack|columnar)
+    'DEFAULT_RENDERER_CLASSES': (
+        'investments_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'investments_api.renderers.MessagePackRenderer',
+        'investments_api.renderers.ColumnarJSONRenderer',
+    ),
+}
+
+# REDIS_URL shares the cache between workers, so evicting a changed user (signals.py)
+# reaches every worker; the local memory cache is per process
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        }
+    }
+
+# seconds an authenticated user stays cached for JWT requests (capped to a few seconds
+# when the cache is per process, see authentication.py)
+JWT_USER_CACHE_TIMEOUT = int(os.environ.get('JWT_USER_CACHE_TIMEOUT', 300 if REDIS_URL else 5))
+
+# bulk user provisioning: hashing processes for the provision_users command; the
+# HTTP endpoint hashes in the request, so it only takes small batches
+BULK_PROVISIONING_WORKERS = int(os.environ.get('BULK_PROVISIONING_WORKERS', os.cpu_count() or 1))
+BULK_PROVISIONING_MAX_ROWS = int(os.environ.get('BULK_PROVISIONING_MAX_ROWS', 200))
+# lowest password hasher work factor a batch may ask for (unset: the hasher's default)
+BULK_PROVISIONING_MIN_ITERATIONS = int(os.environ['BULK_PROVISIONING_MIN_ITERATIONS']) if os.environ.get('BULK_PROVISIONING_MIN_ITERATIONS') else None
+
+# staff request profiles (X-Profile header), served by admin/profiles/<id>/
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles'))
+# hours a profile is kept (older ones are deleted when a new one is written)
+PROFILING_RETENTION_HOURS = float(os.environ.get('PROFILING_RETENTION_HOURS', 24))
+
+# admin report job results (run_report_worker), served by admin/reports/<id>/download/
+REPORTS_DIR = Path(os.environ.get('REPORTS_DIR', BASE_DIR / 'reports'))
+# a job whose worker went stale this many times is failed instead of requeued
+REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get('REPORT_JOB_MAX_ATTEMPTS', 3))
+# days finished report jobs and their files are kept (run_report_worker deletes older ones)
+REPORT_RETENTION_DAYS = float(os.environ.get('REPORT_RETENTION_DAYS', 7))
+
+# /metrics: shared directory for multi-process servers (gunicorn workers), unset for a single process
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# token buckets for POST .../transactions/, kept per process (divide by the worker count)
+TRANSACTION_WRITE_THROTTLE_RATES = {
+    'user': os.environ.get('TRANSACTION_USER_THROTTLE_RATE', '60/min'),
+    'account': os.environ.get('TRANSACTION_ACCOUNT_THROTTLE_RATE', '600/min'),
 }
 
+# relay_outbox: default webhook sink and retry backoff (seconds, doubled per attempt)
+OUTBOX_WEBHOOK_URL = os.environ.get('OUTBOX_WEBHOOK_URL')
+OUTBOX_BASE_BACKOFF = 1
+OUTBOX_MAX_BACKOFF = 300
+
+# investment-accounts/<id>/stream/ (ASGI only): LocalBackend for a single process,
+# PostgresNotifyBackend to fan out across processes and nodes
+STREAM_BACKEND = os.environ.get('STREAM_BACKEND', 'investments_api.streams.LocalBackend')
+STREAM_HEARTBEAT = 15
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
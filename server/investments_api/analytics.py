@@ -0,0 +1,150 @@
+import heapq
+from datetime import datetime, time
+from itertools import chain, groupby
+from operator import itemgetter
+from django.db.models import Case, Count, F, Sum, When
+from django.utils import timezone
+from .balances import balance_aggregates
+from .exports import get_export_queryset
+from .models import InvestmentAccount, Transaction, User
+from .routers import get_shards, scatter
+
+GROUP_FIELDS = {
+    'account': 'account_id',
+    'user': 'user_id',
+}
+
+# aggregated in SQL; anything else is streamed through top_peak_balances
+SQL_METRICS = ['balance', 'inflow', 'outflow', 'count']
+STREAMED_METRICS = ['peak_balance']
+METRICS = SQL_METRICS + STREAMED_METRICS
+
+
+def get_metric_expression(metric):
+    if metric == 'inflow':
+        return balance_aggregates()['total_credits']
+    if metric == 'outflow':
+        return balance_aggregates()['total_debits']
+    if metric == 'count':
+        return Count('id')
+    return Sum(Case(
+        When(transaction_type='credit', then=F('amount')),
+        When(transaction_type='debit', then=-F('amount')),
+        default=0,
+    ))
+
+
+def _rank(item):
+    # highest value first, ties by key
+    return -item[1], item[0]
+
+
+def top_by_aggregate(queryset, group_field, metric, limit, chunk_size=5000):
+    # ORDER BY value LIMIT in SQL on a single shard. Across shards an account lives on
+    # one shard, so each shard's top accounts suffice; a user's accounts can be spread
+    # over several, so per-user sums stream in user order from every shard, are added
+    # up and kept in a heap of `limit` entries, so memory is O(limit) either way.
+    shards = get_shards()
+    grouped = queryset.values(group_field).annotate(value=get_metric_expression(metric)).values_list(group_field, 'value')
+    if len(shards) == 1:
+        return list(grouped.using(shards[0]).order_by('-value', group_field)[:limit])
+
+    if group_field == 'account_id':
+        ranked = scatter(lambda alias: list(grouped.using(alias).order_by('-value', group_field)[:limit]), shards)
+        return heapq.nsmallest(limit, chain.from_iterable(ranked), key=_rank)
+
+    rows = heapq.merge(*[
+        grouped.using(alias).order_by(group_field).iterator(chunk_size=chunk_size)
+        for alias in shards
+    ])
+    totals = ((key, sum(value for _, value in group)) for key, group in groupby(rows, key=itemgetter(0)))
+    return heapq.nsmallest(limit, totals, key=_rank)
+
+
+def top_peak_balances(queryset, opening_queryset, group_field, limit, chunk_size=5000):
+    # Highest running balance per group within the range, in one pass over the range's
+    # transactions ordered by (group, created_at). Opening balances (before the range)
+    # come from a second stream in the same group order and are merged in, and only
+    # the best `limit` groups are kept in a min-heap, so memory is O(limit).
+    # Both streams are merged across shards in that order.
+    shards = get_shards()
+    rows = heapq.merge(*[
+        queryset.using(alias).order_by(group_field, 'created_at', 'id')
+        .values_list(group_field, 'created_at', 'id', 'transaction_type', 'amount')
+        .iterator(chunk_size=chunk_size)
+        for alias in shards
+    ])
+    shard_openings = heapq.merge(*[
+        opening_queryset.using(alias).values(group_field)
+        .annotate(value=get_metric_expression('balance'))
+        .order_by(group_field)
+        .values_list(group_field, 'value')
+        .iterator(chunk_size=chunk_size)
+        for alias in shards
+    ])
+    openings = (
+        (key, sum(value for _, value in group))
+        for key, group in groupby(shard_openings, key=itemgetter(0))
+    )
+    heap = []
+
+    def offer(key, value):
+        if len(heap) < limit:
+            heapq.heappush(heap, (value, str(key), key))
+        elif value > heap[0][0]:
+            heapq.heapreplace(heap, (value, str(key), key))
+
+    opening = next(openings, None)
+    for key, group_rows in groupby(rows, key=itemgetter(0)):
+        # groups with an opening balance but no transactions in the range
+        while opening is not None and opening[0] < key:
+            offer(*opening)
+            opening = next(openings, None)
+
+        balance = 0
+        if opening is not None and opening[0] == key:
+            balance = opening[1]
+            opening = next(openings, None)
+
+        peak = balance
+        for _, _, _, transaction_type, amount in group_rows:
+            balance += amount if transaction_type == 'credit' else -amount
+            peak = max(peak, balance)
+        offer(key, peak)
+
+    while opening is not None:
+        offer(*opening)
+        opening = next(openings, None)
+
+    return [(key, value) for value, _, key in sorted(heap, key=lambda item: (-item[0], item[1]))]
+
+
+def get_labels(by, keys):
+    if by == 'account':
+        return dict(InvestmentAccount.objects.filter(id__in=keys).values_list('id', 'name'))
+    return dict(User.objects.filter(id__in=keys).values_list('id', 'email'))
+
+
+def top_rankings(metric, by='account', start_date=None, end_date=None, limit=10):
+    # balance and peak_balance are as of the end of the range (everything before the
+    # start counts); inflow, outflow and count cover the range only
+    group_field = GROUP_FIELDS[by]
+
+    if metric == 'peak_balance':
+        queryset = get_export_queryset(start_date=start_date, end_date=end_date)
+        opening_queryset = Transaction.objects.none()
+        if start_date:
+            start = timezone.make_aware(datetime.combine(start_date, time.min))
+            opening_queryset = Transaction.objects.filter(created_at__lt=start)
+        ranked = top_peak_balances(queryset, opening_queryset, group_field, limit)
+    elif metric == 'balance':
+        ranked = top_by_aggregate(get_export_queryset(end_date=end_date), group_field, metric, limit)
+    else:
+        queryset = get_export_queryset(start_date=start_date, end_date=end_date)
+        ranked = top_by_aggregate(queryset, group_field, metric, limit)
+
+    labels = get_labels(by, [key for key, _ in ranked])
+    return [
+        {'rank': rank, by: key, 'label': labels.get(key), 'value': value}
+        for rank, (key, value) in enumerate(ranked, start=1)
+    ]
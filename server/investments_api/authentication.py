@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .metrics import cache_requests
+
+USER_CACHE_KEY = 'jwt-user:{}'
+# evictions only reach the process that made the change when the cache is per process,
+# so other workers may serve a stale (deactivated, deleted) user for this long at most
+LOCAL_CACHE_MAX_TIMEOUT = 5
+
+
+def get_user_cache_key(user_id):
+    return USER_CACHE_KEY.format(user_id)
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(get_user_cache_key(user_id))
+
+
+def invalidate_cached_users(user_ids):
+    cache.delete_many([get_user_cache_key(user_id) for user_id in user_ids])
+
+
+def get_user_cache_timeout():
+    timeout = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 300)
+    if isinstance(caches['default'], LocMemCache):
+        timeout = min(timeout, LOCAL_CACHE_MAX_TIMEOUT)
+    return timeout
+
+
+# JWT authentication with cached user lookups
+class CachedJWTAuthentication(JWTAuthentication):
+    # users are cached together with their groups and group permissions, which is
+    # everything TransactionPermission reads, and evicted by the signals in signals.py
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        cache_key = get_user_cache_key(user_id)
+        user = cache.get(cache_key)
+        cache_requests.inc(cache='jwt_user', result='miss' if user is None else 'hit')
+
+        if user is None:
+            try:
+                user = self.user_model.objects.prefetch_related('groups__permissions').get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+            if user.is_active:
+                cache.set(cache_key, user, get_user_cache_timeout())
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
@@ -0,0 +1,159 @@
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Sum, F, Case, When, Max, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Transaction, BalanceCheckpoint
+from .routers import get_shard, scatter, scatter_accounts
+
+
+def balance_aggregates(prefix=''):
+    return {
+        'total_credits': Sum(Case(
+            When(**{f'{prefix}transaction_type': 'credit'}, then=F(f'{prefix}amount')),
+            default=0,
+        )),
+        'total_debits': Sum(Case(
+            When(**{f'{prefix}transaction_type': 'debit'}, then=F(f'{prefix}amount')),
+            default=0,
+        )),
+    }
+
+
+def get_totals(queryset):
+    totals = queryset.aggregate(**balance_aggregates())
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def get_sharded_totals(queryset, shards=None):
+    # get_totals summed over the transaction shards (all of them by default)
+    totals = {'total_credits': 0, 'total_debits': 0}
+    for shard_totals in scatter(lambda alias: get_totals(queryset.using(alias)), shards):
+        for key, value in shard_totals.items():
+            totals[key] += value
+    return totals
+
+
+def get_account_balances(account_ids):
+    # current totals per account: one grouped query on each shard holding any of them
+    def shard_totals(alias, shard_account_ids):
+        return list(
+            Transaction.objects.using(alias).filter(account_id__in=shard_account_ids)
+            .values('account_id').annotate(**balance_aggregates()).order_by()
+        )
+
+    balances = {account_id: {'total_credits': 0, 'total_debits': 0, 'balance': 0} for account_id in account_ids}
+    for rows in scatter_accounts(shard_totals, account_ids):
+        for row in rows:
+            credits, debits = row['total_credits'] or 0, row['total_debits'] or 0
+            balances[row['account_id']] = {'total_credits': credits, 'total_debits': debits, 'balance': credits - debits}
+    return balances
+
+
+def parse_as_of(value):
+    # ISO datetime, or a date meaning the end of that day
+    as_of = parse_datetime(value)
+    if as_of is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError('Enter a valid date or datetime.')
+        as_of = datetime.combine(date, time.max)
+
+    if timezone.is_naive(as_of):
+        as_of = timezone.make_aware(as_of)
+    return as_of
+
+
+def get_pair_filters(user=None, account=None):
+    filters = {}
+    if user is not None:
+        filters['user'] = user
+    if account is not None:
+        filters['account'] = account
+    return filters
+
+
+def latest_checkpoints(as_of, **filters):
+    # the newest checkpoint at or before as_of for each (user, account) pair
+    newest = BalanceCheckpoint.objects.filter(
+        user=OuterRef('user'), account=OuterRef('account'), as_of__lte=as_of
+    ).order_by('-as_of').values('as_of')[:1]
+    return BalanceCheckpoint.objects.filter(as_of__lte=as_of, **filters).filter(as_of=Subquery(newest))
+
+
+def balance_as_of(as_of, user=None, account=None):
+    # Checkpoints are written for every pair that changed since the previous sweep,
+    # so no pair has transactions between its newest checkpoint and the newest sweep.
+    # The balance is the checkpoint totals plus transactions since that sweep.
+    filters = get_pair_filters(user, account)
+    sweep = BalanceCheckpoint.objects.filter(as_of__lte=as_of).aggregate(sweep=Max('as_of'))['sweep']
+
+    totals = {'total_credits': 0, 'total_debits': 0}
+    transactions = Transaction.objects.filter(created_at__lte=as_of, **filters)
+    shards = [get_shard(getattr(account, 'pk', account))] if account is not None else None
+
+    if sweep is not None:
+        checkpointed = latest_checkpoints(sweep, **filters).aggregate(
+            total_credits=Sum('total_credits'), total_debits=Sum('total_debits')
+        )
+        for key in totals:
+            totals[key] += checkpointed[key] or 0
+        transactions = transactions.filter(created_at__gt=sweep)
+
+    for key, value in get_sharded_totals(transactions, shards).items():
+        totals[key] += value
+
+    return {
+        'as_of': as_of,
+        'checkpoint': sweep,
+        **totals,
+        'balance': totals['total_credits'] - totals['total_debits'],
+    }
+
+
+def create_checkpoints(as_of=None, lag=timedelta(seconds=60)):
+    # Sweep: one cumulative checkpoint per pair with transactions since the previous sweep.
+    # The lag keeps in-flight (uncommitted) transactions out of the sweep window.
+    as_of = as_of or timezone.now() - lag
+
+    with transaction.atomic():
+        previous = BalanceCheckpoint.objects.aggregate(sweep=Max('as_of'))['sweep']
+        if previous is not None and as_of <= previous:
+            return []
+
+        changes = Transaction.objects.filter(created_at__lte=as_of)
+        if previous is not None:
+            changes = changes.filter(created_at__gt=previous)
+        # a pair's transactions all live on its account's shard, so shard rows never overlap
+        grouped = changes.values('user', 'account').annotate(**balance_aggregates())
+        changes = [change for rows in scatter(lambda alias: list(grouped.using(alias))) for change in rows]
+
+        carried = {}
+        if previous is not None and changes:
+            prior = latest_checkpoints(
+                previous,
+                user__in={change['user'] for change in changes},
+                account__in={change['account'] for change in changes},
+            ).values_list('user', 'account', 'total_credits', 'total_debits')
+            carried = {(user, account): (credits, debits) for user, account, credits, debits in prior}
+
+        checkpoints = []
+        for change in changes:
+            credits, debits = carried.get((change['user'], change['account']), (0, 0))
+            checkpoints.append(BalanceCheckpoint(
+                user_id=change['user'],
+                account_id=change['account'],
+                as_of=as_of,
+                total_credits=credits + (change['total_credits'] or 0),
+                total_debits=debits + (change['total_debits'] or 0),
+            ))
+
+        return BalanceCheckpoint.objects.bulk_create(checkpoints)
+
+
+def adjust_checkpoints(user_id, account_id, created_at, transaction_type, amount):
+    # keeps checkpoints at or after a modified/deleted transaction's timestamp correct
+    field = 'total_credits' if transaction_type == 'credit' else 'total_debits'
+    BalanceCheckpoint.objects.filter(
+        user_id=user_id, account_id=account_id, as_of__gte=created_at
+    ).update(**{field: F(field) + amount})
@@ -0,0 +1,120 @@
+import io
+from datetime import datetime, time
+from itertools import chain, islice
+from django.utils import timezone
+from .models import Transaction
+from .routers import get_shards
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FIELDS = ['id', 'user_id', 'account_id', 'amount', 'transaction_type', 'description', 'created_at']
+PARTITION_FIELDS = ['account_id', 'user_id']
+
+
+def get_export_schema():
+    return pa.schema([
+        ('id', pa.string()),
+        ('user_id', pa.string()),
+        ('account_id', pa.string()),
+        ('amount', pa.int64()),
+        ('transaction_type', pa.string()),
+        ('description', pa.string()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+    ])
+
+
+def get_export_queryset(accounts=None, users=None, start_date=None, end_date=None):
+    queryset = Transaction.objects.all()
+
+    if accounts:
+        queryset = queryset.filter(account__in=accounts)
+    if users:
+        queryset = queryset.filter(user__in=users)
+    if start_date:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min)))
+    if end_date:
+        queryset = queryset.filter(created_at__lte=timezone.make_aware(datetime.combine(end_date, time.max)))
+
+    return queryset
+
+
+def iter_record_batches(queryset, batch_size=10000):
+    # Rows come straight off a server-side cursor as tuples (no model instances),
+    # one transaction shard after the other, and are transposed into Arrow columns
+    # one batch at a time.
+    schema = get_export_schema()
+    rows = chain.from_iterable(
+        queryset.using(alias).values_list(*EXPORT_FIELDS).iterator(chunk_size=batch_size)
+        for alias in get_shards()
+    )
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+
+        ids, user_ids, account_ids, amounts, types, descriptions, created = zip(*chunk)
+        yield pa.RecordBatch.from_arrays([
+            pa.array(map(str, ids), pa.string()),
+            pa.array(map(str, user_ids), pa.string()),
+            pa.array(map(str, account_ids), pa.string()),
+            pa.array(amounts, pa.int64()),
+            pa.array(types, pa.string()),
+            pa.array(descriptions, pa.string()),
+            pa.array(created, pa.timestamp('us', tz='UTC')),
+        ], schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_arrow_stream(queryset, batch_size=10000):
+    # Arrow IPC stream, yielded one record batch at a time
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, get_export_schema()) as writer:
+        yield sink.drain()
+        for batch in iter_record_batches(queryset, batch_size):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def write_arrow_file(queryset, path, batch_size=10000):
+    rows = 0
+    with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_stream(sink, get_export_schema()) as writer:
+        for batch in iter_record_batches(queryset, batch_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def write_parquet_dataset(queryset, root_path, partition_by=None, batch_size=10000):
+    rows = 0
+    for index, batch in enumerate(iter_record_batches(queryset, batch_size)):
+        pq.write_to_dataset(
+            pa.Table.from_batches([batch]),
+            root_path=str(root_path),
+            partition_cols=[partition_by] if partition_by else None,
+            basename_template=f'part-{index}-{{i}}.parquet',
+        )
+        rows += batch.num_rows
+    return rows
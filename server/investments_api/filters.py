@@ -0,0 +1,15 @@
+from django_filters import rest_framework as filters
+from .models import Transaction
+
+# Transactions
+class TransactionFilter(filters.FilterSet):
+    amount_min = filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    amount_max = filters.NumberFilter(field_name='amount', lookup_expr='lte')
+    created_after = filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lte')
+    # a plain id, not a ModelChoiceFilter listing every user in the filter form
+    user = filters.UUIDFilter(field_name='user_id')
+
+    class Meta:
+        model = Transaction
+        fields = ['transaction_type', 'user', 'amount_min', 'amount_max', 'created_after', 'created_before']
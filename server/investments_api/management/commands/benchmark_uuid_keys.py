@@ -0,0 +1,74 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models, transaction
+from investments_api.uuids import uuid7
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare insert throughput and primary key index size of uuid4 and uuid7 keys (SQLite, PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Rows inserted per key type')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT batch (one transaction each)')
+        parser.add_argument('--database', default='default', help='Database alias to benchmark on')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Unsupported database: {connection.vendor}')
+
+        self.stdout.write(f'{connection.vendor}, {options["rows"]} rows, batches of {options["batch_size"]}')
+        for name, generator in GENERATORS.items():
+            table = f'benchmark_{name}_keys'
+            try:
+                self.create_table(connection, table)
+                elapsed = self.insert_rows(connection, table, generator, options['rows'], options['batch_size'])
+                index_size = self.get_index_size(connection, table)
+            finally:
+                self.drop_table(connection, table)
+
+            size = f'{index_size / 1024 / 1024:.1f} MiB' if index_size is not None else 'n/a'
+            self.stdout.write(f'{name}: {options["rows"] / elapsed:,.0f} rows/s, primary key index {size}')
+
+    def create_table(self, connection, table):
+        # the same column types Django uses for Transaction
+        id_type = connection.data_types['UUIDField']
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(f'CREATE TABLE {table} (id {id_type} NOT NULL PRIMARY KEY, amount integer NOT NULL, description text)')
+
+    def drop_table(self, connection, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def insert_rows(self, connection, table, generator, rows, batch_size):
+        field = models.UUIDField()
+        sql = f'INSERT INTO {table} (id, amount, description) VALUES (%s, %s, %s)'
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            params = [
+                (field.get_db_prep_value(generator(), connection), index, 'benchmark row')
+                for index in range(offset, min(offset + batch_size, rows))
+            ]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+        return time.perf_counter() - start
+
+    def get_index_size(self, connection, table):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_relation_size(%s::regclass)', [f'{table}_pkey'])
+                return cursor.fetchone()[0]
+
+            # dbstat is only available when SQLite is built with SQLITE_ENABLE_DBSTAT_VTAB
+            try:
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [f'sqlite_autoindex_{table}_1'])
+            except Exception:
+                return None
+            return cursor.fetchone()[0]
@@ -0,0 +1,13 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from investments_api.balances import create_checkpoints
+
+class Command(BaseCommand):
+    help = 'Write balance checkpoints for every (user, account) pair with new transactions (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag-seconds', type=int, default=60, help='Leave the most recent transactions for the next sweep')
+
+    def handle(self, *args, **options):
+        checkpoints = create_checkpoints(lag=timedelta(seconds=options['lag_seconds']))
+        self.stdout.write(self.style.SUCCESS(f'{len(checkpoints)} balance checkpoints created'))
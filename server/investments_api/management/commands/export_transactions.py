@@ -0,0 +1,43 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from investments_api import exports
+
+class Command(BaseCommand):
+    help = 'Export transactions as an Arrow IPC stream or a partitioned Parquet dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Arrow file path, or Parquet dataset directory')
+        parser.add_argument('--format', choices=['arrow', 'parquet'], default='arrow')
+        parser.add_argument('--account', action='append', default=[], help='Investment account id (repeatable)')
+        parser.add_argument('--user', action='append', default=[], help='User id (repeatable)')
+        parser.add_argument('--start-date', help='YYYY-MM-DD')
+        parser.add_argument('--end-date', help='YYYY-MM-DD')
+        parser.add_argument('--partition-by', choices=exports.PARTITION_FIELDS, help='Parquet partition column')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if exports.pa is None:
+            raise CommandError('pyarrow must be installed to export transactions')
+
+        try:
+            accounts = [uuid.UUID(value) for value in options['account']]
+            users = [uuid.UUID(value) for value in options['user']]
+        except ValueError as e:
+            raise CommandError(f'Invalid id: {e}')
+
+        dates = {}
+        for name in ('start_date', 'end_date'):
+            if options[name]:
+                dates[name] = parse_date(options[name])
+                if dates[name] is None:
+                    raise CommandError(f'--{name.replace("_", "-")} must be YYYY-MM-DD')
+
+        queryset = exports.get_export_queryset(accounts, users, **dates)
+
+        if options['format'] == 'parquet':
+            rows = exports.write_parquet_dataset(queryset, options['output'], options['partition_by'], options['batch_size'])
+        else:
+            rows = exports.write_arrow_file(queryset, options['output'], options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{rows} transactions exported to {options["output"]}'))
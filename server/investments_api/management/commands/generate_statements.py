@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from investments_api.models import InvestmentAccount
+from investments_api.statements import parse_month, month_bounds, generate_statements
+
+class Command(BaseCommand):
+    help = 'Generate month-end statements for every (user, account) pair, fanned out over a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', required=True, help='YYYY-MM')
+        parser.add_argument('--workers', type=int, help='Number of worker processes')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Accounts per worker task')
+
+    def handle(self, *args, **options):
+        try:
+            month = parse_month(options['month'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # statements are immutable, so only closed months can be generated
+        if month_bounds(month)[1] > timezone.now():
+            raise CommandError(f'{options["month"]} has not ended yet')
+
+        account_ids = InvestmentAccount.objects.values_list('id', flat=True)
+        count = generate_statements(month, account_ids, workers=options['workers'], chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'{count} statements generated for {options["month"]}'))
@@ -0,0 +1,41 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from investments_api.provisioning import provision_users
+
+class Command(BaseCommand):
+    help = 'Bulk create users from a CSV file (email, password, first_name, last_name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file with a header row')
+        parser.add_argument('--iterations', type=int, help='Password hasher work factor for this batch')
+        parser.add_argument('--workers', type=int, help='Number of password hashing processes')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['iterations'] is not None and options['iterations'] < 1:
+            raise CommandError('--iterations must be a positive integer')
+
+        with open(options['file'], newline='') as f:
+            rows = list(csv.DictReader(f))
+
+        try:
+            results = provision_users(
+                rows,
+                iterations=options['iterations'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        created = 0
+        for result in results:
+            # header is line 1
+            line = result['row'] + 2
+            if result['status'] == 'created':
+                created += 1
+                self.stdout.write(f'line {line}: created {result["email"]}')
+            else:
+                self.stdout.write(self.style.ERROR(f'line {line}: {result["email"]} {result["errors"]}'))
+
+        self.stdout.write(self.style.SUCCESS(f'{created} users created, {len(results) - created} failed'))
@@ -0,0 +1,30 @@
+import json
+from django.core.management.base import BaseCommand
+from investments_api.models import ReconciliationRun
+from investments_api.reconciliation import reconcile
+
+class Command(BaseCommand):
+    help = 'Check stored balances (checkpoints, statements) against the transaction ledger in parallel chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Accounts per worker task')
+        parser.add_argument('--workers', type=int, help='Number of worker processes')
+        parser.add_argument('--resume', action='store_true', help='Continue the last unfinished run')
+
+    def handle(self, *args, **options):
+        run = None
+        if options['resume']:
+            run = ReconciliationRun.objects.filter(status=ReconciliationRun.RUNNING).order_by('-started_at').first()
+            if run:
+                self.stdout.write(f'Resuming run {run.id} after {run.accounts_checked} accounts')
+
+        if run is None:
+            run = ReconciliationRun.objects.create(chunk_size=options['chunk_size'])
+
+        run = reconcile(run, workers=options['workers'])
+
+        for mismatch in run.mismatches:
+            self.stdout.write(self.style.ERROR(json.dumps(mismatch)))
+
+        style = self.style.ERROR if run.mismatches else self.style.SUCCESS
+        self.stdout.write(style(f'Run {run.id}: {run.accounts_checked} accounts checked, {len(run.mismatches)} mismatches'))
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from investments_api.outbox import SINKS, prune_events, relay
+from investments_api.routers import get_shards
+
+class Command(BaseCommand):
+    help = 'Deliver pending transaction change events from the outbox to a sink (webhook, file or queue)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sink', choices=SINKS, default='webhook', help='Where events are delivered')
+        parser.add_argument('--target', help='Webhook URL or file path (defaults to OUTBOX_WEBHOOK_URL for webhooks)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Events fetched per pass')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is drained')
+        parser.add_argument('--prune-after', type=float, help='Delete delivered events older than this many days (they also leave the change feed)')
+        parser.add_argument('--prune-interval', type=float, default=600, help='Seconds between prune runs')
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        if options['sink'] == 'webhook':
+            target = target or getattr(settings, 'OUTBOX_WEBHOOK_URL', None)
+        if options['sink'] != 'queue' and not target:
+            raise CommandError(f'--target is required for the {options["sink"]} sink')
+
+        sink = SINKS[options['sink']](target)
+        last_prune = None
+        while True:
+            if options['prune_after'] is not None and (last_prune is None or time.monotonic() - last_prune >= options['prune_interval']):
+                last_prune = time.monotonic()
+                for alias in get_shards():
+                    pruned = prune_events(timedelta(days=options['prune_after']), using=alias)
+                    if pruned:
+                        self.stdout.write(f'{alias}: {pruned} delivered events pruned')
+
+            drained = True
+            # each transaction shard has its own outbox
+            for alias in get_shards():
+                delivered, failed = relay(sink, batch_size=options['batch_size'], using=alias)
+                if delivered or failed:
+                    self.stdout.write(f'{alias}: {delivered} events delivered, {failed} waiting for retry')
+                if delivered + failed >= options['batch_size']:
+                    drained = False
+
+            if options['once']:
+                break
+            if drained:
+                time.sleep(options['interval'])
@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from investments_api.reports import ReportJobLost, claim_next_job, prune_reports, run_job
+
+class Command(BaseCommand):
+    help = 'Compute queued admin report jobs (run one or more of these alongside the web servers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Transactions written per chunk')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when no job is pending')
+        parser.add_argument('--stale-minutes', type=int, default=5, help='Requeue running jobs without progress for this long')
+        parser.add_argument('--max-attempts', type=int, help='Fail stale jobs after this many claims (default: REPORT_JOB_MAX_ATTEMPTS)')
+        parser.add_argument('--keep-days', type=float, help='Delete finished jobs and their files after this many days (default: REPORT_RETENTION_DAYS)')
+        parser.add_argument('--prune-interval', type=float, default=600, help='Seconds between retention sweeps')
+        parser.add_argument('--once', action='store_true', help='Process pending jobs and exit')
+
+    def handle(self, *args, **options):
+        keep_days = options['keep_days']
+        if keep_days is None:
+            keep_days = getattr(settings, 'REPORT_RETENTION_DAYS', 7)
+
+        last_prune = None
+        while True:
+            if last_prune is None or time.monotonic() - last_prune >= options['prune_interval']:
+                last_prune = time.monotonic()
+                pruned = prune_reports(timedelta(days=keep_days))
+                if pruned:
+                    self.stdout.write(f'{pruned} finished reports deleted')
+
+            job = claim_next_job(stale_after=timedelta(minutes=options['stale_minutes']), max_attempts=options['max_attempts'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Report {job.id} started')
+            try:
+                job = run_job(job, chunk_size=options['chunk_size'])
+            except ReportJobLost:
+                self.stdout.write(self.style.WARNING(f'Report {job.id} was taken over by another worker'))
+                continue
+            except Exception as exc:
+                self.stdout.write(self.style.ERROR(f'Report {job.id} failed: {exc}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Report {job.id} completed: {job.rows_written} transactions'))
@@ -0,0 +1,183 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from rest_framework.exceptions import PermissionDenied
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def label_values(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self.name, self.label_values(labels), lambda value: (value or 0) + amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(registry, name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        def update(state):
+            # [bucket counts..., +Inf count, sum]
+            state = state or [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += 1
+            state[-1] += value
+            return state
+
+        self.registry.update(self.name, self.label_values(labels), update)
+
+
+class Registry:
+    # In-process metrics. With a multiprocess directory configured (gunicorn), each
+    # process periodically writes its values to its own file and the scraped process
+    # sums every file, so totals cover all workers.
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.reset()
+        atexit.register(self.flush)
+
+    def reset(self):
+        self.values = {}
+        self.pid = os.getpid()
+        self.last_flush = 0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def update(self, name, labels, func):
+        with self.lock:
+            # a forked worker starts from zero rather than the parent's values
+            if os.getpid() != self.pid:
+                self.reset()
+            key = (name, labels)
+            self.values[key] = func(self.values.get(key))
+
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        if self.directory and time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    @property
+    def directory(self):
+        directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+        return Path(directory) if directory else None
+
+    def flush(self):
+        directory = self.directory
+        if directory is None:
+            return
+
+        with self.lock:
+            self.last_flush = time.monotonic()
+            data = [[name, list(labels), value] for (name, labels), value in self.values.items()]
+
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'metrics_{self.pid}.json'
+        tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        if self.directory is None:
+            with self.lock:
+                return dict(self.values)
+
+        self.flush()
+        values = {}
+        for path in self.directory.glob('metrics_*.json'):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, value in data:
+                key = (name, tuple(labels))
+                if isinstance(value, list):
+                    current = values.get(key) or [0] * len(value)
+                    values[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    values[key] = values.get(key, 0) + value
+        return values
+
+    def render(self):
+        values = self.collect()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+
+            series = sorted((labels, value) for (name, labels), value in values.items() if name == metric.name)
+            for labels, value in series:
+                pairs = list(zip(metric.labelnames, labels))
+                if metric.type == 'histogram':
+                    for bound, count in zip((*metric.buckets, '+Inf'), value[:-1]):
+                        lines.append(f'{metric.name}_bucket{format_labels(pairs + [("le", bound)])} {count}')
+                    lines.append(f'{metric.name}_sum{format_labels(pairs)} {value[-1]}')
+                    lines.append(f'{metric.name}_count{format_labels(pairs)} {value[-2]}')
+                else:
+                    lines.append(f'{metric.name}{format_labels(pairs)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+registry = Registry()
+
+request_duration = Histogram(registry, 'http_request_duration_seconds', 'Request latency by URL name.', ['view', 'method', 'status'])
+db_queries = Counter(registry, 'db_queries_total', 'Database queries executed, by URL name.', ['view'])
+transactions_created = Counter(registry, 'transactions_created_total', 'Transactions created, by type.', ['transaction_type'])
+permission_denials = Counter(registry, 'permission_denials_total', 'Requests denied by TransactionPermission.', ['check'])
+cache_requests = Counter(registry, 'cache_requests_total', 'Cache lookups, by cache and result.', ['cache', 'result'])
+
+
+def count_denials(check):
+    # counts permission methods that return False or raise PermissionDenied
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                allowed = method(*args, **kwargs)
+            except PermissionDenied:
+                permission_denials.inc(check=check)
+                raise
+            if not allowed:
+                permission_denials.inc(check=check)
+            return allowed
+        return wrapper
+    return decorator
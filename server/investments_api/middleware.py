@@ -0,0 +1,164 @@
+import cProfile
+import json
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from .authentication import CachedJWTAuthentication
+from .metrics import request_duration, db_queries
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+TOP_FUNCTIONS = 40
+
+
+def get_profiles_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def prune_profiles(older_than):
+    # Deletes profile files (.prof and .json) written more than `older_than` ago
+    cutoff = time.time() - older_than.total_seconds()
+    profiles_dir = get_profiles_dir()
+    if not profiles_dir.exists():
+        return
+    for path in profiles_dir.iterdir():
+        if path.suffix in ('.prof', '.json') and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+
+class QueryRecorder:
+    # connection.execute_wrapper that records every statement with its duration
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'database': self.alias,
+                'sql': sql,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'many': many,
+            })
+
+
+def summarize_profile(profiler, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (primitive_calls, calls, total_time, cumulative_time, _) in stats.stats.items():
+        rows.append({
+            'function': f'{filename}:{line}({function})',
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_time_ms': round(total_time * 1000, 3),
+            'cumulative_time_ms': round(cumulative_time * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumulative_time_ms'], reverse=True)
+    return rows[:limit]
+
+
+# On-demand request profiling for staff (X-Profile: 1 header or ?profile=1)
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # the only cost for normal requests: a header lookup and a substring check
+        if not self.profiling_requested(request) or not self.is_staff(request):
+            return self.get_response(request)
+
+        return self.profile(request)
+
+    def profiling_requested(self, request):
+        if request.META.get(PROFILE_HEADER):
+            return True
+        return f'{PROFILE_PARAM}=' in request.META.get('QUERY_STRING', '') and bool(request.GET.get(PROFILE_PARAM))
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+
+        # API clients authenticate with JWT, which DRF only resolves inside the view
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+        return result is not None and result[0].is_staff
+
+    def profile(self, request):
+        profile_id = uuid.uuid4()
+        recorders = [QueryRecorder(connection.alias) for connection in connections.all()]
+        profiler = cProfile.Profile()
+
+        with ExitStack() as stack:
+            for connection, recorder in zip(connections.all(), recorders):
+                stack.enter_context(connection.execute_wrapper(recorder))
+
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+
+        queries = [query for recorder in recorders for query in recorder.queries]
+        summary = {
+            'id': str(profile_id),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status_code': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'query_count': len(queries),
+            'query_time_ms': round(sum(query['duration_ms'] for query in queries), 3),
+            'queries': queries,
+            'functions': summarize_profile(profiler),
+        }
+
+        profiles_dir = get_profiles_dir()
+        profiles_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(profiles_dir / f'{profile_id}.prof')
+        (profiles_dir / f'{profile_id}.json').write_text(json.dumps(summary))
+        # profiles are rare, so expiring old ones on each write is cheap
+        prune_profiles(timedelta(hours=getattr(settings, 'PROFILING_RETENTION_HOURS', 24)))
+
+        response['X-Profile-Id'] = str(profile_id)
+        return response
+
+
+# Per-view latency and query counts for /metrics
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            # every alias, not only opened ones: a fresh thread connects during the request
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_queries))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        request_duration.observe(time.perf_counter() - start, view=view, method=request.method, status=response.status_code)
+        if queries:
+            db_queries.inc(queries, view=view)
+        return response
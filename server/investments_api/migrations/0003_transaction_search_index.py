@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from investments_api.search import install_search_index
+    install_search_index(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from investments_api.search import uninstall_search_index
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0002_transaction_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
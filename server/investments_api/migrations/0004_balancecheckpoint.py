@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:16
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0003_transaction_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField()),
+                ('total_credits', models.BigIntegerField(default=0)),
+                ('total_debits', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='investments_api.investmentaccount')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['as_of'], name='checkpoint_as_of'), models.Index(fields=['account', 'as_of'], name='checkpoint_account_as_of')],
+                'unique_together': {('user', 'account', 'as_of')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:17
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0004_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountStatement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('opening_balance', models.BigIntegerField()),
+                ('total_credits', models.BigIntegerField()),
+                ('total_debits', models.BigIntegerField()),
+                ('closing_balance', models.BigIntegerField()),
+                ('line_items', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statements', to='investments_api.investmentaccount')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'month'], name='statement_account_month')],
+                'unique_together': {('user', 'account', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:18
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0005_accountstatement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=20)),
+                ('chunk_size', models.PositiveIntegerField()),
+                ('last_account_id', models.UUIDField(blank=True, null=True)),
+                ('accounts_checked', models.PositiveIntegerField(default=0)),
+                ('mismatches', models.JSONField(default=list)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
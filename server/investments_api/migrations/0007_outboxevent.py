@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:25
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0006_reconciliationrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('account_id', models.UUIDField()),
+                ('transaction_id', models.UUIDField()),
+                ('event_type', models.CharField(choices=[('transaction.created', 'Transaction created'), ('transaction.updated', 'Transaction updated'), ('transaction.deleted', 'Transaction deleted')], max_length=30)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['id'], name='outbox_pending')],
+            },
+        ),
+    ]
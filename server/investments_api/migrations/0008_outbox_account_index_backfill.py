@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:26
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_created_events(apps, schema_editor):
+    # so a change feed read from cursor 0 covers transactions older than the outbox;
+    # marked delivered because relay consumers already knew about them
+    Transaction = apps.get_model('investments_api', 'Transaction')
+    OutboxEvent = apps.get_model('investments_api', 'OutboxEvent')
+    db_alias = schema_editor.connection.alias
+    recorded = OutboxEvent.objects.using(db_alias).values('transaction_id')
+    now = timezone.now()
+
+    transactions = Transaction.objects.using(db_alias).exclude(id__in=recorded).order_by('created_at', 'id')
+    batch = []
+    for tx in transactions.iterator(chunk_size=2000):
+        batch.append(OutboxEvent(
+            account_id=tx.account_id,
+            transaction_id=tx.id,
+            event_type='transaction.created',
+            payload={
+                'id': tx.id,
+                'user': tx.user_id,
+                'account': tx.account_id,
+                'amount': tx.amount,
+                'description': tx.description,
+                'transaction_type': tx.transaction_type,
+                'created_at': tx.created_at,
+            },
+            delivered_at=now,
+        ))
+        if len(batch) == 2000:
+            OutboxEvent.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    OutboxEvent.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0007_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['account_id', 'id'], name='outbox_account_id'),
+        ),
+        migrations.RunPython(backfill_created_events, migrations.RunPython.noop),
+    ]
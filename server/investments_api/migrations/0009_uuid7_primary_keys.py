@@ -0,0 +1,56 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:31
+
+import investments_api.uuids
+from django.db import migrations, models
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds the transaction table for AlterField, dropping the FTS triggers
+    from investments_api.search import install_search_index
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0008_outbox_account_index_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accountstatement',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='balancecheckpoint',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='investmentaccount',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='reconciliationrun',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='userinvestmentaccount',
+            name='id',
+            field=models.UUIDField(default=investments_api.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(reinstall_search_index, reinstall_search_index),
+    ]
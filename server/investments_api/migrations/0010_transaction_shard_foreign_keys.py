@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 06:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite rebuilds the transaction table for AlterField, dropping the FTS triggers
+    from investments_api.search import install_search_index
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0009_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='account',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='investments_api.investmentaccount'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(reinstall_search_index, reinstall_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0011_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='worker_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_existing_events(apps, schema_editor):
+    # existing events keep their id as sequence, so cursors clients already hold stay valid
+    OutboxEvent = apps.get_model('investments_api', 'OutboxEvent')
+    OutboxEvent.objects.using(schema_editor.connection.alias).update(sequence=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0012_reportjob_claims'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxevent',
+            name='outbox_account_id',
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(stamp_existing_events, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('sequence__isnull', True)), fields=['id'], name='outbox_unstamped'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['account_id', 'sequence'], name='outbox_account_sequence'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:29
+
+from django.db import migrations
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite: rebuilds the FTS table keyed by transaction id instead of rowid
+    from investments_api.search import install_search_index
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_api', '0013_outboxevent_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-import uuid
+from .uuids import uuid7
+from .routers import get_shard
 
 # Create your models here.
 # custom user model
@@ -25,7 +27,7 @@ class UserManager(BaseUserManager):
 
 class User(AbstractUser):
     # uuids as pk for enhanced security
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     email = models.EmailField(unique=True)
     username = None
     accounts = models.ManyToManyField('InvestmentAccount', through='UserInvestmentAccount')
@@ -45,7 +47,7 @@ class User(AbstractUser):
 
 # InvestmentAccount
 class InvestmentAccount(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -63,6 +65,13 @@ class InvestmentAccount(models.Model):
     ]
     
     permission = models.CharField(max_length=50, choices=ACCESS_LEVEL)
+
+    # group granting each access level to account members
+    ACCESS_GROUPS = {
+        VIEW: 'view_group',
+        FULL_CRUD: 'crud_group',
+        POST_ONLY: 'create_group',
+    }
     
     class Meta:
         permissions = [
@@ -76,7 +85,7 @@ class InvestmentAccount(models.Model):
 
 # User & InvestmentAccount association table
 class UserInvestmentAccount(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     investment_account = models.ForeignKey(InvestmentAccount, on_delete=models.CASCADE)
 
@@ -87,15 +96,41 @@ class UserInvestmentAccount(models.Model):
         return f'{self.user} - {self.investment_account}'
 
 # transactions
+class TransactionQuerySet(models.QuerySet):
+    def for_account(self, account_id):
+        # the account's transactions, read from its shard (routers.py)
+        return self.using(get_shard(account_id)).filter(account_id=account_id)
+
+    def create(self, **kwargs):
+        # new rows go to their account's shard unless a database was chosen
+        account_id = kwargs.get('account_id') or getattr(kwargs.get('account'), 'pk', None)
+        if self._db is None and account_id:
+            return super().using(get_shard(account_id)).create(**kwargs)
+        return super().create(**kwargs)
+
 class Transaction(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='transactions')
-    account = models.ForeignKey('InvestmentAccount', on_delete=models.CASCADE, related_name='transactions')
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    # no database constraints: with shards, users and accounts live on "default", not the
+    # transaction's database (signals.delete_sharded_transactions covers the cascade)
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='transactions', db_constraint=False)
+    account = models.ForeignKey('InvestmentAccount', on_delete=models.CASCADE, related_name='transactions', db_constraint=False)
     amount = models.IntegerField()
     description = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     transaction_type = models.CharField(max_length=10, choices=[('credit', 'Deposit'), ('debit', 'Withdrawal')])
 
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        # composite indexes backing TransactionFilter on the account and admin user views
+        indexes = [
+            models.Index(fields=['account', 'created_at'], name='transaction_account_created'),
+            models.Index(fields=['account', 'transaction_type', 'created_at'], name='transaction_account_type'),
+            models.Index(fields=['account', 'amount'], name='transaction_account_amount'),
+            models.Index(fields=['user', 'created_at'], name='transaction_user_created'),
+            models.Index(fields=['user', 'transaction_type', 'created_at'], name='transaction_user_type'),
+        ]
+
     def __str__(self):
         return f'{self.user} - {self.account} - {self.amount} - {self.transaction_type}'
 
@@ -105,4 +140,167 @@ class Transaction(models.Model):
 
     @property
     def is_debit(self):
-        return self.transaction_type == 'debit'
\ No newline at end of file
+        return self.transaction_type == 'debit'
+
+    def save(self, *args, **kwargs):
+        # the outbox event (signals.py) commits or rolls back together with the change
+        using = kwargs.get('using') or router.db_for_write(Transaction, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+# cumulative per (user, account) totals up to a point in time, for "as of" balances
+class BalanceCheckpoint(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='balance_checkpoints')
+    account = models.ForeignKey('InvestmentAccount', on_delete=models.CASCADE, related_name='balance_checkpoints')
+    as_of = models.DateTimeField()
+    total_credits = models.BigIntegerField(default=0)
+    total_debits = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'account', 'as_of']
+        indexes = [
+            models.Index(fields=['as_of'], name='checkpoint_as_of'),
+            models.Index(fields=['account', 'as_of'], name='checkpoint_account_as_of'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.account} - {self.as_of}'
+
+    @property
+    def balance(self):
+        return self.total_credits - self.total_debits
+
+# month-end statement per (user, account); written once by generate_statements
+class AccountStatement(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='statements')
+    account = models.ForeignKey('InvestmentAccount', on_delete=models.CASCADE, related_name='statements')
+    month = models.DateField()
+    opening_balance = models.BigIntegerField()
+    total_credits = models.BigIntegerField()
+    total_debits = models.BigIntegerField()
+    closing_balance = models.BigIntegerField()
+    line_items = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'account', 'month']
+        indexes = [
+            models.Index(fields=['account', 'month'], name='statement_account_month'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.account} - {self.month:%Y-%m}'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Account statements are immutable.')
+        super().save(*args, **kwargs)
+
+# progress of a ledger reconciliation run, so an interrupted run can resume
+class ReconciliationRun(models.Model):
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+
+    STATUS = [
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS, default=RUNNING)
+    chunk_size = models.PositiveIntegerField()
+    last_account_id = models.UUIDField(null=True, blank=True)
+    accounts_checked = models.PositiveIntegerField(default=0)
+    mismatches = models.JSONField(default=list)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.started_at:%Y-%m-%d %H:%M} - {self.status}'
+
+# transaction change events, written in the same DB transaction as the change
+# and pushed to consumers by relay_outbox
+class OutboxEvent(models.Model):
+    CREATED = 'transaction.created'
+    UPDATED = 'transaction.updated'
+    DELETED = 'transaction.deleted'
+
+    EVENT_TYPES = [
+        (CREATED, 'Transaction created'),
+        (UPDATED, 'Transaction updated'),
+        (DELETED, 'Transaction deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    # commit order: ids are taken at insert, but sequence numbers only once the event
+    # is committed (outbox.stamp_events), so the change feed cursor never skips one
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True)
+    account_id = models.UUIDField()
+    transaction_id = models.UUIDField()
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sequence'], condition=models.Q(delivered_at__isnull=True), name='outbox_pending'),
+            models.Index(fields=['id'], condition=models.Q(sequence__isnull=True), name='outbox_unstamped'),
+            # change feed: an account's events after a cursor
+            models.Index(fields=['account_id', 'sequence'], name='outbox_account_sequence'),
+        ]
+
+    def __str__(self):
+        return f'{self.id} - {self.event_type} - {self.transaction_id}'
+
+# admin user transaction report, computed in the background by run_report_worker;
+# identical requests share one job while it is pending or running
+class ReportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    STATUS = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    ACTIVE = [PENDING, RUNNING]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='report_jobs')
+    requested_by = models.ForeignKey('User', on_delete=models.SET_NULL, null=True, blank=True, related_name='requested_report_jobs')
+    params = models.JSONField(default=dict)
+    dedup_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS, default=PENDING)
+    rows_written = models.PositiveIntegerField(default=0)
+    total_balance = models.BigIntegerField(null=True, blank=True)
+    # claims so far, and the current claim's token: writes from a superseded worker are dropped
+    attempts = models.PositiveIntegerField(default=0)
+    worker_token = models.UUIDField(null=True, blank=True)
+    result_file = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'], condition=models.Q(status__in=['pending', 'running']), name='reportjob_active_dedup'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.status}'
@@ -0,0 +1,177 @@
+import json
+import os
+import queue
+import urllib.request
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Max, Value, When
+from django.utils import timezone
+from .models import OutboxEvent
+
+BASE_BACKOFF = 1
+MAX_BACKOFF = 300
+
+
+def get_payload(instance):
+    return {
+        'id': instance.pk,
+        'user': instance.user_id,
+        'account': instance.account_id,
+        'amount': instance.amount,
+        'description': instance.description,
+        'transaction_type': instance.transaction_type,
+        'created_at': instance.created_at,
+    }
+
+
+def record_event(instance, event_type, using='default'):
+    return OutboxEvent.objects.using(using).create(
+        account_id=instance.account_id,
+        transaction_id=instance.pk,
+        event_type=event_type,
+        payload=get_payload(instance),
+    )
+
+
+def stamp_events(using='default', batch_size=1000):
+    # Gives committed, unstamped events the next sequence numbers, in id order. Only
+    # committed rows are visible here, so an event whose transaction commits late is
+    # stamped after everything already stamped and never lands behind a cursor.
+    # Concurrent calls race for the same numbers; all but one roll back (unique
+    # constraint, or rows already stamped) and their events wait for the next call.
+    # Returns the number of events stamped.
+    events = OutboxEvent.objects.using(using)
+    try:
+        with transaction.atomic(using=using):
+            last = events.aggregate(last=Max('sequence'))['last'] or 0
+            ids = list(events.filter(sequence__isnull=True).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return 0
+
+            stamped = events.filter(id__in=ids, sequence__isnull=True).update(sequence=Case(
+                *[When(id=event_id, then=Value(last + offset)) for offset, event_id in enumerate(ids, start=1)]
+            ))
+            if stamped != len(ids):
+                raise IntegrityError('Outbox events were stamped concurrently.')
+    except IntegrityError:
+        return 0
+    return len(ids)
+
+
+def to_message(event):
+    return {
+        'id': event.id,
+        'sequence': event.sequence,
+        'type': event.event_type,
+        'account_id': str(event.account_id),
+        'transaction_id': str(event.transaction_id),
+        'created_at': event.created_at.isoformat(),
+        'payload': event.payload,
+    }
+
+
+# Sinks receive the messages of one account, oldest first, and raise to reject them
+class WebhookSink:
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, messages):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({'events': messages}, cls=DjangoJSONEncoder).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        # urlopen raises HTTPError for non-2xx responses
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class FileSink:
+    # appends one JSON line per event
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, messages):
+        with open(self.path, 'a') as file:
+            for message in messages:
+                file.write(json.dumps(message, cls=DjangoJSONEncoder) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class QueueSink:
+    # in-process stand-in for a message broker
+    def __init__(self, target=None):
+        self.queue = target if target is not None else queue.Queue()
+
+    def send(self, messages):
+        for message in messages:
+            self.queue.put(message)
+
+
+SINKS = {
+    'webhook': WebhookSink,
+    'file': FileSink,
+    'queue': QueueSink,
+}
+
+
+def get_backoff(attempts):
+    base = getattr(settings, 'OUTBOX_BASE_BACKOFF', BASE_BACKOFF)
+    return min(getattr(settings, 'OUTBOX_MAX_BACKOFF', MAX_BACKOFF), base * 2 ** (attempts - 1))
+
+
+def relay(sink, batch_size=500, using='default'):
+    # One pass over the pending events in commit order (sequence, see stamp_events), so
+    # an event whose transaction committed late is never overtaken by a later one of the
+    # same account. Events are delivered per account; when a delivery fails, the
+    # account's oldest event is scheduled for a retry with exponential backoff and the
+    # rest of that account waits behind it. Expects a single relay process per
+    # database. Returns (delivered, failed) event counts.
+    stamp_events(using=using, batch_size=batch_size)
+    now = timezone.now()
+    pending = OutboxEvent.objects.using(using).filter(delivered_at__isnull=True, sequence__isnull=False)
+    blocked = pending.filter(next_attempt_at__gt=now).values('account_id')
+    events = list(pending.exclude(account_id__in=blocked).order_by('sequence')[:batch_size])
+
+    by_account = {}
+    for event in events:
+        by_account.setdefault(event.account_id, []).append(event)
+
+    delivered = failed = 0
+    for account_events in by_account.values():
+        try:
+            sink.send([to_message(event) for event in account_events])
+        except Exception as exc:
+            head = account_events[0]
+            head.attempts += 1
+            head.last_error = f'{type(exc).__name__}: {exc}'
+            head.next_attempt_at = timezone.now() + timedelta(seconds=get_backoff(head.attempts))
+            head.save(update_fields=['attempts', 'last_error', 'next_attempt_at'], using=using)
+            failed += len(account_events)
+            continue
+
+        OutboxEvent.objects.using(using).filter(id__in=[event.id for event in account_events]).update(
+            delivered_at=timezone.now(), attempts=F('attempts') + 1, next_attempt_at=None, last_error='',
+        )
+        delivered += len(account_events)
+
+    return delivered, failed
+
+
+def prune_events(older_than, using='default', batch_size=1000):
+    # Deletes delivered events older than `older_than` (a timedelta), oldest first. They
+    # also drop out of the change feed, so the retention has to cover how far behind its
+    # clients may fall. Returns the number of events deleted.
+    cutoff = timezone.now() - older_than
+    events = OutboxEvent.objects.using(using)
+    deleted = 0
+    while True:
+        ids = list(events.filter(delivered_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += events.filter(id__in=ids).delete()[0]
@@ -0,0 +1,29 @@
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.db import connections
+
+
+def _init_worker():
+    # no-op for forked workers, required when the start method is spawn
+    django.setup()
+
+
+def iter_parallel(func, items, workers=None, chunksize=1):
+    # Maps func over items in a process pool, yielding results in order as they
+    # finish. Workers open their own database connections, so the parent's are
+    # closed before forking. Inside a transaction the parent's connections must stay
+    # open (and workers could not see its uncommitted rows), so it runs serially.
+    items = list(items)
+    in_atomic_block = any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+    if (workers is not None and workers <= 1) or len(items) <= 1 or in_atomic_block:
+        for item in items:
+            yield func(item)
+        return
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        yield from executor.map(func, items, chunksize=chunksize)
+
+
+def run_parallel(func, items, workers=None, chunksize=1):
+    return list(iter_parallel(func, items, workers=workers, chunksize=chunksize))
@@ -1,10 +1,16 @@
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
 from .models import InvestmentAccount, UserInvestmentAccount, User
+from .metrics import count_denials
 from django.core.exceptions import ValidationError
 import uuid
 
+# evaluated in python so prefetched (cached) groups don't hit the database again
+def in_group(user_groups, group_name):
+    return any(group.name == group_name for group in user_groups)
+
 class TransactionPermission(permissions.BasePermission):
+    @count_denials('has_permission')
     def has_permission(self, request, view):
         transaction_data = request.data
         user_id = transaction_data.get('user')
@@ -19,50 +25,69 @@ class TransactionPermission(permissions.BasePermission):
             def get_user_by_email_or_id(user_identifier):
                 if isinstance(user_identifier, User):
                     return user_identifier
+                if str(user_identifier) in (str(request.user.pk), getattr(request.user, 'email', None)):
+                    return request.user
                 try:
-                    uuid_obj = uuid.UUID(str(user_identifier), version=4)
+                    uuid_obj = uuid.UUID(str(user_identifier))
                     user = User.objects.get(id=uuid_obj)
                 except (ValueError, TypeError, ValidationError):
                     user = User.objects.get(email=user_identifier)
                 return user
 
-            user_investment = UserInvestmentAccount.objects.get(user=get_user_by_email_or_id(user), investment_account=account_id)
-            account = user_investment.investment_account
             user = get_user_by_email_or_id(user)
+            user_investment = UserInvestmentAccount.objects.select_related('investment_account').get(user=user, investment_account=account_id)
+            account = user_investment.investment_account
             user_groups = user.groups.all()
-            user_access_rights = [group.permissions.all()[0].codename for group in user.groups.all()]
+            user_access_rights = [group.permissions.all()[0].codename for group in user_groups]
 
             if account.permission == InvestmentAccount.VIEW and 'can_only_read_transactions' in user_access_rights:
-                return request.method == 'GET' and user_groups.filter(name='view_group').exists()
+                return request.method == 'GET' and in_group(user_groups, 'view_group')
             elif account.permission == InvestmentAccount.FULL_CRUD and 'can_crud_transactions' in user_access_rights:
-                return user_groups.filter(name='crud_group').exists()
+                return in_group(user_groups, 'crud_group')
             elif account.permission == InvestmentAccount.POST_ONLY and 'can_only_create_transactions' in user_access_rights:
-                return request.method == 'POST' and user_groups.filter(name='create_group').exists()
+                return request.method == 'POST' and in_group(user_groups, 'create_group')
             else:
                 raise PermissionDenied(detail='You do not have permission to perform this action.')
 
         except UserInvestmentAccount.DoesNotExist:
             raise PermissionDenied(detail='You are not a member of this investment account.')
 
+    @count_denials('has_object_permission')
     def has_object_permission(self, request, view, obj):
         user = request.user
-        account_id = obj.account.id
+        account_id = obj.account_id
 
         # Membership restriction
         try:
-            user_investment = UserInvestmentAccount.objects.get(user=user, investment_account_id=account_id)
+            user_investment = UserInvestmentAccount.objects.select_related('investment_account').get(user=user, investment_account_id=account_id)
             account = user_investment.investment_account
 
             user_groups = user.groups.all()
 
             if account.permission == InvestmentAccount.VIEW:
-                return request.method == 'GET' and user_groups.filter(name='view_group').exists()
+                return request.method == 'GET' and in_group(user_groups, 'view_group')
             elif account.permission == InvestmentAccount.FULL_CRUD:
-                return user_groups.filter(name='crud_group').exists()
+                return in_group(user_groups, 'crud_group')
             elif account.permission == InvestmentAccount.POST_ONLY:
-                return request.method == 'POST' and user_groups.filter(name='create_group').exists()
+                return request.method == 'POST' and in_group(user_groups, 'create_group')
 
         except UserInvestmentAccount.DoesNotExist:
             raise PermissionDenied(detail='You are not a member of this investment account.')
 
-        return False
\ No newline at end of file
+        return False
+
+# read access as granted by TransactionPermission, resolved for many accounts at once
+# (one membership query) for views outside TransactionPermission (streams, batch balances)
+def get_readable_account_ids(user, account_ids):
+    memberships = UserInvestmentAccount.objects.filter(
+        user=user, investment_account_id__in=account_ids
+    ).values_list('investment_account_id', 'investment_account__permission')
+
+    user_groups = user.groups.all()
+    return {
+        account_id for account_id, permission in memberships
+        if permission != InvestmentAccount.POST_ONLY and in_group(user_groups, InvestmentAccount.ACCESS_GROUPS[permission])
+    }
+
+def can_read_transactions(user, account_id):
+    return bool(get_readable_account_ids(user, [account_id]))
@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from .models import User
+from .parallel import run_parallel
+
+
+def get_batch_hasher(iterations=None):
+    hasher = get_hasher('default')
+    if iterations is None:
+        return hasher
+
+    if not hasattr(hasher, 'iterations'):
+        raise ValueError(f'The {hasher.algorithm} hasher has no configurable iterations.')
+
+    # copy so the process-wide cached hasher keeps its own work factor
+    batch_hasher = type(hasher)()
+    batch_hasher.iterations = iterations
+    return batch_hasher
+
+
+def get_min_iterations():
+    minimum = getattr(settings, 'BULK_PROVISIONING_MIN_ITERATIONS', None)
+    if minimum is None:
+        minimum = getattr(get_hasher('default'), 'iterations', 1)
+    return minimum
+
+
+def _hash_passwords(args):
+    passwords, iterations = args
+    hasher = get_batch_hasher(iterations)
+    return [hasher.encode(password, hasher.salt()) for password in passwords]
+
+
+def hash_passwords(passwords, iterations=None, workers=None, chunk_size=100):
+    if iterations is not None and iterations < get_min_iterations():
+        raise ValueError(f'Ensure this value is greater than or equal to {get_min_iterations()}.')
+
+    chunks = [(passwords[i:i + chunk_size], iterations) for i in range(0, len(passwords), chunk_size)]
+    hashed = run_parallel(_hash_passwords, chunks, workers=workers)
+    return [encoded for chunk in hashed for encoded in chunk]
+
+
+def validate_rows(rows):
+    errors = {}
+    seen = set()
+
+    for index, row in enumerate(rows):
+        row_errors = {}
+        if not isinstance(row, dict):
+            errors[index] = {'non_field_errors': ['Expected an object with email and password.']}
+            continue
+
+        email = row.get('email') or ''
+        if not isinstance(email, str):
+            email = ''
+            row_errors['email'] = ['Not a valid string.']
+        elif not email:
+            row_errors['email'] = ['This field is required.']
+        else:
+            email = User.objects.normalize_email(email)
+            try:
+                validate_email(email)
+            except ValidationError as e:
+                row_errors['email'] = list(e.messages)
+
+        if not row.get('password'):
+            row_errors['password'] = ['This field is required.']
+        elif not isinstance(row['password'], str):
+            row_errors['password'] = ['Not a valid string.']
+
+        for name in ('first_name', 'last_name'):
+            value = row.get(name)
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                row_errors[name] = ['Not a valid string.']
+            elif len(value) > User._meta.get_field(name).max_length:
+                row_errors[name] = [f'Ensure this field has no more than {User._meta.get_field(name).max_length} characters.']
+
+        if email and 'email' not in row_errors:
+            if email in seen:
+                row_errors['email'] = ['Duplicate email in this batch.']
+            seen.add(email)
+
+        if row_errors:
+            errors[index] = row_errors
+
+    return errors
+
+
+def provision_users(rows, iterations=None, workers=None, batch_size=1000):
+    # Creates users in bulk, hashing passwords across a process pool (serially with workers=1).
+    # Returns one result per input row, in input order.
+    if workers is None:
+        workers = getattr(settings, 'BULK_PROVISIONING_WORKERS', None)
+
+    results = [{'row': index, 'email': row.get('email') if isinstance(row, dict) else None} for index, row in enumerate(rows)]
+    errors = validate_rows(rows)
+
+    pending = [index for index in range(len(rows)) if index not in errors]
+    emails = {index: User.objects.normalize_email(rows[index]['email']) for index in pending}
+
+    existing = set()
+    email_list = list(emails.values())
+    for i in range(0, len(email_list), batch_size):
+        existing.update(User.objects.filter(email__in=email_list[i:i + batch_size]).values_list('email', flat=True))
+
+    for index in pending:
+        if emails[index] in existing:
+            errors[index] = {'email': ['user with this email already exists.']}
+    pending = [index for index in pending if index not in errors]
+
+    hashed = hash_passwords([rows[index]['password'] for index in pending], iterations=iterations, workers=workers)
+
+    users = {}
+    for index, password in zip(pending, hashed):
+        row = rows[index]
+        users[index] = User(
+            email=emails[index],
+            password=password,
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+        )
+
+    indexes = list(users)
+    for i in range(0, len(indexes), batch_size):
+        batch = [users[index] for index in indexes[i:i + batch_size]]
+        with transaction.atomic():
+            User.objects.bulk_create(batch, ignore_conflicts=True)
+            created = set(User.objects.filter(pk__in=[user.pk for user in batch]).values_list('pk', flat=True))
+
+        for index in indexes[i:i + batch_size]:
+            if users[index].pk not in created:
+                errors[index] = {'email': ['user with this email already exists.']}
+
+    for index, result in enumerate(results):
+        if index in errors:
+            result.update(status='error', errors=errors[index])
+        else:
+            result.update(status='created', id=str(users[index].pk), email=users[index].email)
+
+    return results
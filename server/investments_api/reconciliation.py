@@ -0,0 +1,121 @@
+from django.db.models import DateField
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import InvestmentAccount, Transaction, BalanceCheckpoint, AccountStatement, ReconciliationRun
+from .balances import balance_aggregates, latest_checkpoints
+from .parallel import iter_parallel
+from .statements import previous_month
+from .routers import scatter_accounts
+
+
+def _mismatch(kind, user, account, stored, ledger, **extra):
+    return {
+        'kind': kind,
+        'user': str(user),
+        'account': str(account),
+        **{key: str(value) for key, value in extra.items()},
+        'stored': stored,
+        'ledger': ledger,
+    }
+
+
+def reconcile_checkpoints(account_ids):
+    # newest checkpoint per pair against the ledger totals at the checkpoint time
+    mismatches = []
+    by_as_of = {}
+    for checkpoint in latest_checkpoints(timezone.now(), account__in=account_ids):
+        by_as_of.setdefault(checkpoint.as_of, []).append(checkpoint)
+
+    for as_of, checkpoints in by_as_of.items():
+        def shard_ledger(alias, shard_account_ids):
+            return list(Transaction.objects.using(alias).filter(
+                account__in=shard_account_ids, created_at__lte=as_of
+            ).values('user', 'account').annotate(**balance_aggregates()))
+
+        ledger = {
+            (totals['user'], totals['account']): (totals['total_credits'] or 0, totals['total_debits'] or 0)
+            for rows in scatter_accounts(shard_ledger, {checkpoint.account_id for checkpoint in checkpoints})
+            for totals in rows
+        }
+
+        for checkpoint in checkpoints:
+            stored = (checkpoint.total_credits, checkpoint.total_debits)
+            expected = ledger.get((checkpoint.user_id, checkpoint.account_id), (0, 0))
+            if stored != expected:
+                mismatches.append(_mismatch(
+                    'checkpoint', checkpoint.user_id, checkpoint.account_id,
+                    stored={'total_credits': stored[0], 'total_debits': stored[1]},
+                    ledger={'total_credits': expected[0], 'total_debits': expected[1]},
+                    as_of=as_of.isoformat(),
+                ))
+
+    return mismatches
+
+
+def reconcile_statements(account_ids):
+    # statement credits/debits against per-month ledger sums, and opening/closing continuity
+    mismatches = []
+
+    def shard_ledger(alias, shard_account_ids):
+        return list(Transaction.objects.using(alias).filter(account__in=shard_account_ids).annotate(
+            month=TruncMonth('created_at', output_field=DateField())
+        ).values('user', 'account', 'month').annotate(**balance_aggregates()))
+
+    ledger = {
+        (totals['user'], totals['account'], totals['month']): (totals['total_credits'] or 0, totals['total_debits'] or 0)
+        for rows in scatter_accounts(shard_ledger, account_ids)
+        for totals in rows
+    }
+
+    previous = {}
+    statements = AccountStatement.objects.filter(account__in=account_ids).order_by('user', 'account', 'month').values(
+        'user', 'account', 'month', 'opening_balance', 'total_credits', 'total_debits', 'closing_balance'
+    )
+    for statement in statements.iterator():
+        pair = (statement['user'], statement['account'])
+        stored = {key: statement[key] for key in ('opening_balance', 'total_credits', 'total_debits', 'closing_balance')}
+        credits, debits = ledger.get((*pair, statement['month']), (0, 0))
+        previous_month_closing = previous.get(pair)
+        if previous_month_closing and previous_month_closing[0] == previous_month(statement['month']):
+            opening = previous_month_closing[1]
+        else:
+            opening = statement['opening_balance']
+        expected = {
+            'opening_balance': opening,
+            'total_credits': credits,
+            'total_debits': debits,
+            'closing_balance': opening + credits - debits,
+        }
+        previous[pair] = (statement['month'], statement['closing_balance'])
+
+        if stored != expected:
+            mismatches.append(_mismatch('statement', *pair, stored=stored, ledger=expected, month=statement['month'].strftime('%Y-%m')))
+
+    return mismatches
+
+
+def reconcile_accounts(account_ids):
+    # one process-pool task
+    return account_ids[-1], len(account_ids), reconcile_checkpoints(account_ids) + reconcile_statements(account_ids)
+
+
+def reconcile(run, workers=None):
+    # Verifies the accounts after run.last_account_id in key-ordered chunks, saving
+    # progress after each chunk completes so an interrupted run can resume.
+    accounts = InvestmentAccount.objects.order_by('id').values_list('id', flat=True)
+    if run.last_account_id:
+        accounts = accounts.filter(id__gt=run.last_account_id)
+
+    account_ids = list(accounts)
+    chunks = [account_ids[i:i + run.chunk_size] for i in range(0, len(account_ids), run.chunk_size)]
+
+    for last_account_id, checked, mismatches in iter_parallel(reconcile_accounts, chunks, workers=workers):
+        run.last_account_id = last_account_id
+        run.accounts_checked += checked
+        run.mismatches.extend(mismatches)
+        run.save(update_fields=['last_account_id', 'accounts_checked', 'mismatches'])
+
+    run.status = ReconciliationRun.COMPLETED
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at'])
+    return run
@@ -0,0 +1,95 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    # anything orjson/msgpack can't encode natively (Decimal, lazy strings, querysets...)
+    return _encoder.default(obj)
+
+
+def to_columns(rows):
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    return {key: [row.get(key) for row in rows] for key in columns}
+
+
+def is_row_list(value):
+    return isinstance(value, list) and all(isinstance(row, dict) for row in value)
+
+
+# JSON
+class ORJSONRenderer(JSONRenderer):
+    # drop-in JSONRenderer that encodes with orjson when it is installed
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=encode_default, option=options)
+
+
+class ColumnarJSONRenderer(ORJSONRenderer):
+    # {"id": [...], "amount": [...]} instead of a list of objects with repeated keys
+    media_type = 'application/vnd.goinvest.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if is_row_list(data):
+            data = to_columns(data)
+        elif isinstance(data, dict):
+            # paginated (results) and admin report (transactions) payloads
+            data = {
+                key: to_columns(value) if key in ('results', 'transactions') and is_row_list(value) else value
+                for key, value in data.items()
+            }
+
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+# MessagePack
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack is not None, 'msgpack must be installed to use MessagePackRenderer'
+
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+# Arrow
+class ArrowStreamRenderer(BaseRenderer):
+    # views stream the IPC bytes themselves; this only makes the media type negotiable
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
@@ -0,0 +1,180 @@
+import hashlib
+import heapq
+import json
+import os
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .exports import get_export_queryset
+from .filters import TransactionFilter
+from .models import ReportJob
+from .routers import get_shards
+from .serializers import TransactionSerializer
+
+REPORT_FILTERS = ['transaction_type', 'amount_min', 'amount_max', 'created_after', 'created_before']
+
+
+def get_reports_dir():
+    return Path(getattr(settings, 'REPORTS_DIR', settings.BASE_DIR / 'reports'))
+
+
+def get_dedup_key(user_id, params):
+    normalized = json.dumps({'user': str(user_id), **params}, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def submit_report(user_id, params, requested_by=None):
+    # returns (job, created); a pending or running job with the same parameters is reused
+    dedup_key = get_dedup_key(user_id, params)
+    existing = ReportJob.objects.filter(dedup_key=dedup_key, status__in=ReportJob.ACTIVE).first()
+    if existing:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            return ReportJob.objects.create(user_id=user_id, requested_by=requested_by, params=params, dedup_key=dedup_key), True
+    except IntegrityError:
+        # lost the race to an identical request
+        return ReportJob.objects.get(dedup_key=dedup_key, status__in=ReportJob.ACTIVE), False
+
+
+class ReportJobLost(Exception):
+    # the job was requeued and claimed by another worker while this one was running it
+    pass
+
+
+def get_max_attempts():
+    return getattr(settings, 'REPORT_JOB_MAX_ATTEMPTS', 3)
+
+
+def claim_next_job(stale_after=timedelta(minutes=5), max_attempts=None):
+    now = timezone.now()
+    max_attempts = max_attempts or get_max_attempts()
+    # jobs of a worker that died mid-run go back to the queue, until they run out of attempts
+    stale = ReportJob.objects.filter(status=ReportJob.RUNNING, heartbeat_at__lt=now - stale_after)
+    stale.filter(attempts__gte=max_attempts).update(
+        status=ReportJob.FAILED, worker_token=None, finished_at=now,
+        error=f'Gave up after {max_attempts} attempts without progress.',
+    )
+    stale.filter(attempts__lt=max_attempts).update(status=ReportJob.PENDING, worker_token=None)
+
+    for job_id in ReportJob.objects.filter(status=ReportJob.PENDING).order_by('created_at').values_list('id', flat=True)[:10]:
+        # conditional update, so concurrent workers never claim the same job
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING, worker_token=uuid.uuid4(), attempts=F('attempts') + 1, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None
+
+
+def get_report_queryset(job):
+    params = job.params
+    queryset = get_export_queryset(
+        users=[job.user_id],
+        start_date=parse_date(params['start_date']) if params.get('start_date') else None,
+        end_date=parse_date(params['end_date']) if params.get('end_date') else None,
+    )
+    filters = {name: params[name] for name in REPORT_FILTERS if params.get(name) is not None}
+    return TransactionFilter(filters, queryset=queryset).qs
+
+
+def iter_report_rows(queryset, chunk_size):
+    # oldest first, merged across transaction shards
+    ordered = queryset.order_by('created_at', 'id')
+    streams = [ordered.using(alias).iterator(chunk_size=chunk_size) for alias in get_shards()]
+    return heapq.merge(*streams, key=lambda transaction: (transaction.created_at, transaction.id))
+
+
+def write_rows(file, rows, first):
+    for row in rows:
+        if not first:
+            file.write(',')
+        file.write(json.dumps(row, cls=DjangoJSONEncoder))
+        first = False
+    return first
+
+
+def run_job(job, chunk_size=5000):
+    # Streams the report into <REPORTS_DIR>/<job id>-<token>.json in chunks, recording
+    # progress (and a heartbeat) after each one. The file only appears once it is
+    # complete. Every update is conditional on this worker's claim; once it is lost
+    # the run stops with ReportJobLost and leaves the job to the new worker.
+    reports_dir = get_reports_dir()
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    path = reports_dir / f'{job.id}-{job.worker_token}.json'
+    tmp_path = path.with_suffix('.json.tmp')
+    claim = ReportJob.objects.filter(pk=job.pk, status=ReportJob.RUNNING, worker_token=job.worker_token)
+
+    try:
+        total_credits = total_debits = rows_written = 0
+        with open(tmp_path, 'w') as file:
+            file.write(f'{{"user": "{job.user_id}", "params": {json.dumps(job.params)}, "transactions": [')
+            first = True
+            chunk = []
+            for transaction in iter_report_rows(get_report_queryset(job), chunk_size):
+                if transaction.transaction_type == 'credit':
+                    total_credits += transaction.amount
+                else:
+                    total_debits += transaction.amount
+                chunk.append(transaction)
+
+                if len(chunk) == chunk_size:
+                    first = write_rows(file, TransactionSerializer(chunk, many=True).data, first)
+                    rows_written += len(chunk)
+                    chunk = []
+                    if not claim.update(rows_written=rows_written, heartbeat_at=timezone.now()):
+                        raise ReportJobLost(job.pk)
+
+            write_rows(file, TransactionSerializer(chunk, many=True).data, first)
+            rows_written += len(chunk)
+            file.write(f'], "total_balance": {total_credits - total_debits}}}')
+
+        os.replace(tmp_path, path)
+    except ReportJobLost:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    except Exception as exc:
+        tmp_path.unlink(missing_ok=True)
+        claim.update(status=ReportJob.FAILED, error=f'{type(exc).__name__}: {exc}', finished_at=timezone.now())
+        raise
+
+    completed = claim.update(
+        status=ReportJob.COMPLETED, rows_written=rows_written, total_balance=total_credits - total_debits,
+        result_file=path.name, finished_at=timezone.now(),
+    )
+    if not completed:
+        path.unlink(missing_ok=True)
+        raise ReportJobLost(job.pk)
+
+    job.refresh_from_db()
+    return job
+
+
+def prune_reports(older_than):
+    # Deletes finished jobs older than `older_than` with their result files, then any
+    # file that old no job refers to (temporary files of killed workers, results of
+    # jobs deleted with their user). Returns the number of jobs deleted.
+    cutoff = timezone.now() - older_than
+    reports_dir = get_reports_dir()
+    jobs = ReportJob.objects.filter(status__in=[ReportJob.COMPLETED, ReportJob.FAILED], finished_at__lt=cutoff)
+
+    deleted = 0
+    for job_id, result_file in jobs.values_list('id', 'result_file').iterator():
+        if result_file:
+            (reports_dir / result_file).unlink(missing_ok=True)
+        deleted += ReportJob.objects.filter(pk=job_id).delete()[0]
+
+    if reports_dir.exists():
+        old_files = {path.name: path for path in reports_dir.iterdir() if path.stat().st_mtime < cutoff.timestamp()}
+        kept = set(ReportJob.objects.filter(result_file__in=old_files).values_list('result_file', flat=True))
+        for name, path in old_files.items():
+            if name not in kept:
+                path.unlink(missing_ok=True)
+    return deleted
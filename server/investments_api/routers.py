@@ -0,0 +1,92 @@
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+
+# stored on the shard of their account; everything else stays on "default"
+SHARDED_MODELS = {'investments_api.transaction', 'investments_api.outboxevent'}
+
+
+def get_shards():
+    return list(getattr(settings, 'TRANSACTION_SHARDS', None) or ['default'])
+
+
+def is_sharded():
+    return get_shards() != ['default']
+
+
+def get_shard(account_id):
+    # stable across processes and restarts (unlike hash()); changing the number of
+    # shards moves accounts, so resharding needs a data migration
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+
+    digest = hashlib.blake2b(uuid.UUID(str(account_id)).bytes, digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+def _run_on_shard(func, alias):
+    try:
+        return func(alias)
+    finally:
+        # connections are per thread
+        connections.close_all()
+
+
+def scatter(func, shards=None):
+    # func(alias) on every shard in parallel threads; results in shard order
+    shards = shards or get_shards()
+    if len(shards) == 1:
+        return [func(shards[0])]
+
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        return list(executor.map(lambda alias: _run_on_shard(func, alias), shards))
+
+
+def group_by_shard(account_ids):
+    by_shard = {}
+    for account_id in account_ids:
+        by_shard.setdefault(get_shard(account_id), []).append(account_id)
+    return by_shard
+
+
+def scatter_accounts(func, account_ids):
+    # func(alias, shard_account_ids) on each shard holding any of the accounts
+    by_shard = group_by_shard(account_ids)
+    if not by_shard:
+        return []
+    return scatter(lambda alias: func(alias, by_shard[alias]), list(by_shard))
+
+
+# Routes transactions and their outbox events to the shard of their account. Every
+# database is migrated with the full schema (migrate --database shard_N); only the
+# sharded tables are used on shards.
+class TransactionShardRouter:
+    def get_shard_for(self, model, hints):
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return None
+
+        # __dict__, not getattr: a deferred account_id would be loaded through this router
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._meta.label_lower == 'investments_api.investmentaccount':
+            # related managers (account.transactions) pass the account itself
+            account_id = instance.pk
+        else:
+            account_id = instance.__dict__.get('account_id')
+        return get_shard(account_id) if account_id else None
+
+    def db_for_read(self, model, **hints):
+        return self.get_shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.get_shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # transactions reference users and accounts on the default database
+        if {obj1._meta.label_lower, obj2._meta.label_lower} & SHARDED_MODELS:
+            return True
+        return None
@@ -0,0 +1,123 @@
+from django.db import NotSupportedError, connections
+from .models import Transaction
+
+TRANSACTION_TABLE = Transaction._meta.db_table
+SQLITE_FTS_TABLE = f'{TRANSACTION_TABLE}_fts'
+POSTGRES_SEARCH_INDEX = 'transaction_search_vector'
+
+
+# Full-text index setup (called from migrations)
+def install_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'ALTER TABLE {TRANSACTION_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            f"GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED"
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} ON {TRANSACTION_TABLE} USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        # For development and tests; production search runs on PostgreSQL. The FTS5 table
+        # keeps its own copy of the descriptions keyed by the transaction id (UNINDEXED),
+        # not the table's implicit rowid, which SQLite may renumber on VACUUM or when a
+        # migration remakes the table. Deletes and description updates find their row by
+        # scanning that column. Safe to re-run.
+        uninstall_search_index(schema_editor)
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5('
+            f"transaction_id UNINDEXED, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SQLITE_FTS_TABLE}_ai AFTER INSERT ON {TRANSACTION_TABLE} BEGIN '
+            f'INSERT INTO {SQLITE_FTS_TABLE}(transaction_id, description) VALUES (new.id, new.description); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SQLITE_FTS_TABLE}_ad AFTER DELETE ON {TRANSACTION_TABLE} BEGIN '
+            f'DELETE FROM {SQLITE_FTS_TABLE} WHERE transaction_id = old.id; END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {SQLITE_FTS_TABLE}_au AFTER UPDATE OF description ON {TRANSACTION_TABLE} BEGIN '
+            f'UPDATE {SQLITE_FTS_TABLE} SET description = new.description WHERE transaction_id = old.id; END'
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SQLITE_FTS_TABLE}(transaction_id, description) SELECT id, description FROM {TRANSACTION_TABLE}'
+        )
+
+
+def uninstall_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}')
+        schema_editor.execute(f'ALTER TABLE {TRANSACTION_TABLE} DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+
+
+# Ranked search
+def get_search_sql(vendor):
+    if vendor == 'postgresql':
+        where = (
+            f"FROM {TRANSACTION_TABLE} t WHERE t.account_id = %(account)s "
+            f"AND t.search_vector @@ plainto_tsquery('english', %(query)s)"
+        )
+        order = "ORDER BY ts_rank(t.search_vector, plainto_tsquery('english', %(query)s)) DESC, t.created_at DESC"
+    elif vendor == 'sqlite':
+        where = (
+            f'FROM {SQLITE_FTS_TABLE} f JOIN {TRANSACTION_TABLE} t ON t.id = f.transaction_id '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %(query)s AND t.account_id = %(account)s'
+        )
+        order = 'ORDER BY f.rank, t.created_at DESC'
+    else:
+        raise NotSupportedError(f'Transaction search is not supported on {vendor}.')
+
+    return f'SELECT COUNT(*) {where}', f'SELECT t.id {where} {order} LIMIT %(limit)s OFFSET %(offset)s'
+
+
+def to_match_query(vendor, query):
+    if vendor != 'sqlite':
+        return query
+    # quote every term so user input is never parsed as FTS5 syntax
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+class TransactionSearchResults:
+    # Lazy, sliceable result set for Django's Paginator: only the count and the
+    # requested page of ranked ids are queried, then that page is loaded by pk.
+    def __init__(self, account_id, query, using='default'):
+        self.using = using
+        self.connection = connections[using]
+        self.count_sql, self.page_sql = get_search_sql(self.connection.vendor)
+        self.params = {
+            'account': Transaction._meta.get_field('account').get_db_prep_value(account_id, self.connection),
+            'query': to_match_query(self.connection.vendor, query),
+        }
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            with self.connection.cursor() as cursor:
+                cursor.execute(self.count_sql, self.params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.page_sql, {**self.params, 'limit': stop - start, 'offset': start})
+            ids = [Transaction._meta.pk.to_python(row[0]) for row in cursor.fetchall()]
+
+        transactions = Transaction.objects.using(self.using).in_bulk(ids)
+        return [transactions[pk] for pk in ids if pk in transactions]
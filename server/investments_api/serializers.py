@@ -1,6 +1,59 @@
 from rest_framework import serializers
+from django.urls import reverse
+from django.core.exceptions import FieldDoesNotExist
 from django.contrib.auth.models import Group
-from .models import User, InvestmentAccount, UserInvestmentAccount, Transaction
+from .models import User, InvestmentAccount, UserInvestmentAccount, Transaction, AccountStatement, OutboxEvent, ReportJob
+from .balances import parse_as_of
+from .analytics import METRICS, GROUP_FIELDS
+from .series import METHODS as SERIES_METHODS
+
+# Sparse fieldsets (?fields=id,amount)
+def get_requested_fields(request):
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+class SparseFieldsetMixin:
+    # drops unrequested fields from read responses; unknown names are ignored
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        requested = get_requested_fields(self.context.get('request'))
+        if requested and requested & set(self.fields):
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_only_fields(cls, requested):
+        # concrete model columns backing the requested fields, for queryset.only()
+        model = cls.Meta.model
+        serializer_fields = cls().get_fields()
+        if not requested & set(serializer_fields):
+            return None
+
+        # foreign key columns are always loaded: permissions and routing read account_id/user_id
+        only = {model._meta.pk.name}
+        only.update(field.name for field in model._meta.concrete_fields if field.is_relation)
+        for name in requested & set(serializer_fields):
+            field = serializer_fields[name]
+            source = (field.source or name).split('.')[0]
+            if field.write_only or source == '*':
+                continue
+
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+
+            if model_field.concrete and not model_field.many_to_many:
+                only.add(model_field.name)
+
+        return only
 
 # Groups
 class GroupSerializer(serializers.ModelSerializer):
@@ -10,15 +63,18 @@ class GroupSerializer(serializers.ModelSerializer):
 
 # User-Investment Accounts
 class UserInvestmentAccountSerializer(serializers.ModelSerializer):
-    user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all())
-    investment_account = serializers.SlugRelatedField(slug_field='name', queryset=InvestmentAccount.objects.all())
+    # text inputs: a <select> in the browsable API would list every user and account
+    user = serializers.SlugRelatedField(slug_field='email', queryset=User.objects.all(), style={'base_template': 'input.html'})
+    investment_account = serializers.SlugRelatedField(
+        slug_field='name', queryset=InvestmentAccount.objects.all(), style={'base_template': 'input.html'}
+    )
 
     class Meta:
         model = UserInvestmentAccount
         fields = ['id', 'user', 'investment_account']
 
 # Users
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     accounts = UserInvestmentAccountSerializer(source='userinvestmentaccount_set', many=True, read_only=True)
     class Meta:
         model = User
@@ -29,7 +85,7 @@ class UserSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 # Investment Accounts
-class InvestmentAccountSerializer(serializers.ModelSerializer):
+class InvestmentAccountSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     users = UserInvestmentAccountSerializer(source='userinvestmentaccount_set', many=True, read_only=True)
 
     class Meta:
@@ -37,16 +93,130 @@ class InvestmentAccountSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'users', 'permission', 'transactions', 'created_at', 'updated_at']
 
 # Transactions
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
+        # text inputs: a <select> in the browsable API would list every user and account
+        extra_kwargs = {
+            'user': {'style': {'base_template': 'input.html'}},
+            'account': {'style': {'base_template': 'input.html'}},
+        }
 
     def validate_amount(self, value):
         if value < 1:
             raise serializers.ValidationError("The amount must be greater than 1.")
         return value
 
+    def validate(self, data):
+        # delete and re-create instead (see signals.remember_previous_transaction)
+        if self.instance is not None:
+            for name in ('user', 'account'):
+                if name in data and data[name] != getattr(self.instance, name):
+                    raise serializers.ValidationError({name: ['A transaction cannot move to another user or account.']})
+        return data
+
     def create(self, validated_data):
         transaction = Transaction.objects.create(**validated_data)
         return transaction
+
+# Transaction exports
+class TransactionExportSerializer(serializers.Serializer):
+    account = serializers.ListField(child=serializers.UUIDField(), required=False)
+    user = serializers.ListField(child=serializers.UUIDField(), required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    batch_size = serializers.IntegerField(min_value=1, max_value=100000, default=10000)
+
+# Point-in-time balances
+class BalanceQuerySerializer(serializers.Serializer):
+    user = serializers.UUIDField(required=False)
+    account = serializers.UUIDField(required=False)
+    as_of = serializers.CharField(required=False)
+
+    def validate_as_of(self, value):
+        try:
+            return parse_as_of(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+# Report jobs
+class ReportJobRequestSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    transaction_type = serializers.ChoiceField(choices=['credit', 'debit'], required=False)
+    amount_min = serializers.IntegerField(required=False)
+    amount_max = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'user', 'params', 'status', 'attempts', 'rows_written', 'total_balance', 'error', 'created_at', 'started_at', 'finished_at', 'download_url']
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.COMPLETED:
+            return None
+        url = reverse('admin-report-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+# Batch account balances
+class AccountBalanceBatchSerializer(serializers.Serializer):
+    accounts = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=200)
+
+# Top-N analytics
+class TopRankingQuerySerializer(serializers.Serializer):
+    metric = serializers.ChoiceField(choices=METRICS, default='balance')
+    by = serializers.ChoiceField(choices=list(GROUP_FIELDS), default='account')
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'end_date': ['The end date must not be before the start date.']})
+        return data
+
+# Balance-over-time series
+class BalanceSeriesQuerySerializer(serializers.Serializer):
+    points = serializers.IntegerField(min_value=3, max_value=5000, default=500)
+    method = serializers.ChoiceField(choices=SERIES_METHODS, default='lttb')
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'end_date': ['The end date must not be before the start date.']})
+        return data
+
+class UserBalanceSeriesQuerySerializer(BalanceSeriesQuerySerializer):
+    account = serializers.UUIDField(required=False)
+
+# Statements
+class AccountStatementSerializer(serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field='email', read_only=True)
+    month = serializers.DateField(format='%Y-%m', read_only=True)
+
+    class Meta:
+        model = AccountStatement
+        fields = ['id', 'user', 'account', 'month', 'opening_balance', 'total_credits', 'total_debits', 'closing_balance', 'line_items', 'created_at']
+
+# Transaction change feed (deletes are tombstones without the transaction)
+class TransactionChangeSerializer(serializers.ModelSerializer):
+    cursor = serializers.IntegerField(source='sequence')
+    deleted = serializers.SerializerMethodField()
+    transaction = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OutboxEvent
+        fields = ['cursor', 'event_type', 'transaction_id', 'deleted', 'transaction', 'created_at']
+
+    def get_deleted(self, obj):
+        return obj.event_type == OutboxEvent.DELETED
+
+    def get_transaction(self, obj):
+        return None if obj.event_type == OutboxEvent.DELETED else obj.payload
@@ -0,0 +1,170 @@
+import heapq
+from datetime import datetime, time
+from django.db.models import F, RowRange, Window
+from django.utils import timezone
+from .analytics import get_metric_expression
+from .balances import get_totals
+from .exports import get_export_queryset
+from .routers import get_shard, get_shards, scatter
+
+METHODS = ['lttb', 'minmax']
+
+
+def get_series_range(start_date=None, end_date=None):
+    # the end is pinned (to now when open) so the row count and the stream agree
+    start = timezone.make_aware(datetime.combine(start_date, time.min)) if start_date else None
+    end = timezone.make_aware(datetime.combine(end_date, time.max)) if end_date else timezone.now()
+    return start, end
+
+
+def running_balances(queryset, chunk_size=5000):
+    # (created_at, id, balance) after every transaction, oldest first. The running sum is
+    # a window function, so rows leave the database already accumulated.
+    rows = (
+        queryset.annotate(balance=Window(
+            get_metric_expression('balance'),
+            order_by=[F('created_at').asc(), F('id').asc()],
+            frame=RowRange(start=None, end=0),
+        ))
+        .order_by('created_at', 'id')
+        .values_list('created_at', 'id', 'balance')
+    )
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _tag_shard(index, rows):
+    for created_at, id, balance in rows:
+        yield created_at, id, index, balance
+
+
+def merge_running_balances(queryset, shards, openings, chunk_size=5000):
+    # (created_at, balance) over several shards: each shard's window-summed stream is
+    # merged in time order, and the balance is the sum of every shard's latest total
+    latest = list(openings)
+    total = sum(latest)
+    streams = [
+        _tag_shard(index, running_balances(queryset.using(alias), chunk_size))
+        for index, alias in enumerate(shards)
+    ]
+    for created_at, _, index, balance in heapq.merge(*streams):
+        balance += openings[index]
+        total += balance - latest[index]
+        latest[index] = balance
+        yield created_at, total
+
+
+def downsample_minmax(points, count, threshold):
+    # index buckets of equal size; each keeps its lowest and highest point (in time
+    # order), so spikes survive. O(1) memory.
+    if count <= threshold:
+        yield from points
+        return
+
+    size = count / (threshold // 2)
+    bucket_end = size
+    low = high = None
+    for index, point in enumerate(points):
+        if index >= bucket_end and low is not None:
+            yield from sorted({low, high})
+            bucket_end += size
+            low = high = None
+        if low is None or point[1] < low[1]:
+            low = point
+        if high is None or point[1] > high[1]:
+            high = point
+    if low is not None:
+        yield from sorted({low, high})
+
+
+def _triangle_area(a, b, c):
+    ax, bx, cx = a[0].timestamp(), b[0].timestamp(), c[0]
+    return abs((ax - cx) * (b[1] - a[1]) - (ax - bx) * (c[1] - a[1]))
+
+
+def downsample_lttb(points, count, threshold):
+    # Largest-Triangle-Three-Buckets over a stream whose length is known up front. Only
+    # the current and next bucket are held, so memory is O(count / threshold).
+    if count <= threshold:
+        yield from points
+        return
+
+    points = iter(points)
+    every = (count - 2) / (threshold - 2)
+    position = 1
+
+    def read_bucket(end):
+        nonlocal position
+        bucket = []
+        while position < end:
+            point = next(points, None)
+            if point is None:
+                break
+            bucket.append(point)
+            position += 1
+        return bucket
+
+    selected = next(points, None)
+    if selected is None:
+        return
+    yield selected
+
+    current = read_bucket(int(every) + 1)
+    for index in range(1, threshold - 1):
+        if index < threshold - 2:
+            following = read_bucket(int((index + 1) * every) + 1)
+        else:
+            following = read_bucket(count)
+        if not following:
+            # rows disappeared since the count; the last point read closes the series
+            if current:
+                yield current[-1]
+            return
+
+        if index < threshold - 2:
+            average = (
+                sum(point[0].timestamp() for point in following) / len(following),
+                sum(point[1] for point in following) / len(following),
+            )
+        else:
+            average = (following[-1][0].timestamp(), following[-1][1])
+
+        if current:
+            selected = max(current, key=lambda point: _triangle_area(selected, point, average))
+            yield selected
+        current = following
+
+    yield current[-1]
+
+
+DOWNSAMPLERS = {
+    'lttb': downsample_lttb,
+    'minmax': downsample_minmax,
+}
+
+
+def balance_series(account_id=None, user_id=None, points=500, method='lttb', start_date=None, end_date=None):
+    # an account's balance, or a user's own transactions' (all their accounts, or one)
+    start, end = get_series_range(start_date, end_date)
+    shards = [get_shard(account_id)] if account_id else get_shards()
+    queryset = get_export_queryset(
+        accounts=[account_id] if account_id else None,
+        users=[user_id] if user_id else None,
+    )
+
+    in_range = queryset.filter(created_at__lte=end)
+    openings = [0] * len(shards)
+    if start is not None:
+        in_range = in_range.filter(created_at__gte=start)
+        openings = [
+            totals['total_credits'] - totals['total_debits']
+            for totals in scatter(lambda alias: get_totals(queryset.using(alias).filter(created_at__lt=start)), shards)
+        ]
+
+    count = sum(scatter(lambda alias: in_range.using(alias).count(), shards))
+    series = DOWNSAMPLERS[method](merge_running_balances(in_range, shards, openings), count, points)
+
+    return {
+        'count': count,
+        'opening_balance': sum(openings),
+        'points': [{'created_at': created_at, 'balance': balance} for created_at, balance in series],
+    }
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.contrib.auth.models import Group
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import User, InvestmentAccount, Transaction, OutboxEvent
+from .authentication import invalidate_cached_user, invalidate_cached_users
+from .balances import adjust_checkpoints
+from .metrics import transactions_created
+from .outbox import record_event
+from .routers import get_shard, get_shards, is_sharded
+from .streams import publish_event
+
+
+# cached JWT users
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_cache_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+
+    if not reverse:
+        invalidate_cached_user(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            invalidate_cached_user(user_id)
+    else:
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            invalidate_cached_user(user_id)
+
+
+def invalidate_group_members(group_ids):
+    invalidate_cached_users(set(User.objects.filter(groups__in=group_ids).values_list('pk', flat=True)))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_user_cache_on_group_permission_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        invalidate_group_members([instance.pk])
+    elif pk_set:
+        invalidate_group_members(pk_set)
+    else:
+        invalidate_group_members(instance.group_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_user_cache_on_group_delete(sender, instance, **kwargs):
+    invalidate_group_members([instance.pk])
+
+
+# On shards, transactions are outside the database the ORM cascade collects from, so
+# they are deleted on their own shard (a user's on every shard). Their tombstones go
+# through the outbox as usual.
+@receiver(pre_delete, sender=InvestmentAccount)
+@receiver(pre_delete, sender=User)
+def delete_sharded_transactions(sender, instance, **kwargs):
+    if not is_sharded():
+        return
+
+    if sender is InvestmentAccount:
+        Transaction.objects.using(get_shard(instance.pk)).filter(account_id=instance.pk).delete()
+    else:
+        for alias in get_shards():
+            Transaction.objects.using(alias).filter(user_id=instance.pk).delete()
+
+
+# balance checkpoints
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, using, **kwargs):
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = Transaction.objects.using(using).filter(pk=instance.pk).values(
+            'user_id', 'account_id', 'transaction_type', 'amount'
+        ).first()
+
+    # checkpoints (and the account's shard) are per pair, so a transaction keeps its pair
+    previous = instance._previous
+    if previous is not None and (previous['user_id'], previous['account_id']) != (instance.user_id, instance.account_id):
+        raise ValueError('A transaction cannot move to another user or account.')
+
+
+@receiver(post_save, sender=Transaction)
+def adjust_checkpoints_on_update(sender, instance, created, **kwargs):
+    # new transactions are newer than every checkpoint (see create_checkpoints)
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        return
+
+    adjust_checkpoints(previous['user_id'], previous['account_id'], instance.created_at, previous['transaction_type'], -previous['amount'])
+    adjust_checkpoints(instance.user_id, instance.account_id, instance.created_at, instance.transaction_type, instance.amount)
+
+
+@receiver(post_delete, sender=Transaction)
+def adjust_checkpoints_on_delete(sender, instance, **kwargs):
+    adjust_checkpoints(instance.user_id, instance.account_id, instance.created_at, instance.transaction_type, -instance.amount)
+
+
+# metrics
+@receiver(post_save, sender=Transaction)
+def count_created_transaction(sender, instance, created, **kwargs):
+    if created:
+        transactions_created.inc(transaction_type=instance.transaction_type)
+
+
+# transactional outbox (Transaction.save and deletes run inside a DB transaction);
+# committed events are also pushed to live stream subscribers. robust: a failed push
+# is logged and must not fail a write that has already committed.
+@receiver(post_save, sender=Transaction)
+def write_outbox_event_on_save(sender, instance, created, using, **kwargs):
+    event = record_event(instance, OutboxEvent.CREATED if created else OutboxEvent.UPDATED, using=using)
+    transaction.on_commit(lambda: publish_event(event), using=using, robust=True)
+
+
+@receiver(post_delete, sender=Transaction)
+def write_outbox_event_on_delete(sender, instance, using, **kwargs):
+    event = record_event(instance, OutboxEvent.DELETED, using=using)
+    transaction.on_commit(lambda: publish_event(event), using=using, robust=True)
@@ -0,0 +1,112 @@
+from datetime import date, datetime
+from itertools import chain
+from django.utils import timezone
+from .models import Transaction, UserInvestmentAccount, AccountStatement
+from .balances import balance_aggregates
+from .parallel import run_parallel
+from .routers import scatter_accounts
+
+
+def parse_month(value):
+    try:
+        parsed = datetime.strptime(value, '%Y-%m')
+    except (TypeError, ValueError):
+        raise ValueError('Enter a month as YYYY-MM.')
+    return date(parsed.year, parsed.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def previous_month(month):
+    return date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime.combine(month, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(next_month(month), datetime.min.time()))
+    return start, end
+
+
+def get_opening_balances(account_ids, month, start):
+    # Previous statements' closing balances. Generation covers every pair with history,
+    # so only accounts without last month's statements need the history aggregate.
+    openings = {}
+    covered = set()
+    for user, account, closing in AccountStatement.objects.filter(
+        account__in=account_ids, month=previous_month(month)
+    ).values_list('user', 'account', 'closing_balance'):
+        openings[(user, account)] = closing
+        covered.add(account)
+
+    uncovered = [account_id for account_id in account_ids if account_id not in covered]
+    if uncovered:
+        def shard_history(alias, shard_account_ids):
+            history = Transaction.objects.using(alias).filter(account__in=shard_account_ids, created_at__lt=start)
+            return list(history.values('user', 'account').annotate(**balance_aggregates()))
+
+        for rows in scatter_accounts(shard_history, uncovered):
+            for totals in rows:
+                openings[(totals['user'], totals['account'])] = (totals['total_credits'] or 0) - (totals['total_debits'] or 0)
+
+    return openings
+
+
+def generate_account_statements(args):
+    # one process-pool task: statements for a range of accounts
+    account_ids, month = args
+    start, end = month_bounds(month)
+
+    openings = get_opening_balances(account_ids, month, start)
+    pairs = set(openings)
+    pairs.update(UserInvestmentAccount.objects.filter(
+        investment_account__in=account_ids
+    ).values_list('user', 'investment_account'))
+
+    # shard by shard: a pair's transactions are all on its account's shard, in order
+    def shard_transactions(alias, shard_account_ids):
+        return list(Transaction.objects.using(alias).filter(
+            account__in=shard_account_ids, created_at__gte=start, created_at__lt=end
+        ).order_by('created_at', 'id').values_list(
+            'id', 'user', 'account', 'amount', 'transaction_type', 'description', 'created_at'
+        ))
+
+    line_items = {}
+    transactions = chain.from_iterable(scatter_accounts(shard_transactions, account_ids))
+    for id, user, account, amount, transaction_type, description, created_at in transactions:
+        pairs.add((user, account))
+        line_items.setdefault((user, account), []).append({
+            'id': str(id),
+            'created_at': created_at.isoformat(),
+            'transaction_type': transaction_type,
+            'amount': amount,
+            'description': description,
+        })
+
+    statements = []
+    for user, account in pairs:
+        items = line_items.get((user, account), [])
+        credits = sum(item['amount'] for item in items if item['transaction_type'] == 'credit')
+        debits = sum(item['amount'] for item in items if item['transaction_type'] == 'debit')
+        opening = openings.get((user, account), 0)
+        statements.append(AccountStatement(
+            user_id=user,
+            account_id=account,
+            month=month,
+            opening_balance=opening,
+            total_credits=credits,
+            total_debits=debits,
+            closing_balance=opening + credits - debits,
+            line_items=items,
+        ))
+
+    # statements that already exist are left untouched
+    AccountStatement.objects.bulk_create(statements, ignore_conflicts=True)
+    return len(statements)
+
+
+def generate_statements(month, account_ids, workers=None, chunk_size=500):
+    account_ids = sorted(account_ids)
+    chunks = [(account_ids[i:i + chunk_size], month) for i in range(0, len(account_ids), chunk_size)]
+    return sum(run_parallel(generate_account_statements, chunks, workers=workers))
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .balances import balance_as_of
+from .models import OutboxEvent
+from .routers import get_shard
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, hub, account_id):
+        self.hub = hub
+        self.account_id = account_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, message):
+        # runs on the subscriber's loop; a slow client loses its oldest messages
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+# In-process fan-out of account events to async subscribers. publish() may be
+# called from any thread (signal handlers run in sync code); an idle subscriber
+# is just a waiting coroutine and a queue.
+class BroadcastHub:
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, account_id):
+        subscription = Subscription(self, str(account_id))
+        with self.lock:
+            self.subscriptions.setdefault(subscription.account_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.account_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.account_id, None)
+
+    def has_subscribers(self, account_id):
+        return str(account_id) in self.subscriptions
+
+    def publish(self, account_id, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(str(account_id), ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # the subscriber's loop is closed
+                self.unsubscribe(subscription)
+
+
+hub = BroadcastHub()
+
+
+# Backends carry published messages to the hubs. LocalBackend serves a single
+# process; PostgresNotifyBackend relays through LISTEN/NOTIFY so every node's
+# hub receives every message.
+class LocalBackend:
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def has_listeners(self, account_id):
+        return self.hub.has_subscribers(account_id)
+
+    def publish(self, account_id, message):
+        self.hub.publish(account_id, message)
+
+
+class PostgresNotifyBackend:
+    channel = 'transaction_stream'
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def start(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, daemon=True)
+                self.listener.start()
+
+    def has_listeners(self, account_id):
+        # subscribers may be on other nodes
+        return True
+
+    def publish(self, account_id, message):
+        # notices are a few ids, well under the 8000-byte NOTIFY payload limit
+        payload = json.dumps({'account_id': str(account_id), 'message': message})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        while True:
+            try:
+                conn = psycopg2.connect(**connection.get_connection_params())
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        data = json.loads(conn.notifies.pop(0).payload)
+                        self.hub.publish(data['account_id'], data['message'])
+            except Exception:
+                logger.exception('Transaction stream listener failed, reconnecting')
+                time.sleep(1)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        backend_class = import_string(getattr(settings, 'STREAM_BACKEND', 'investments_api.streams.LocalBackend'))
+        _backend = backend_class(hub)
+    return _backend
+
+
+def get_account_totals(account_id):
+    # checkpoints plus the transactions since the last sweep (balances.balance_as_of)
+    totals = balance_as_of(timezone.now(), account=account_id)
+    return {key: totals[key] for key in ('total_credits', 'total_debits', 'balance')}
+
+
+def publish_event(event):
+    # Called on commit with the transaction's outbox event. Only the ids are published,
+    # so the write path does no balance query and the notice has a fixed size; the
+    # receiving side builds the message (get_event_message).
+    backend = get_backend()
+    if not backend.has_listeners(event.account_id):
+        return
+
+    backend.publish(event.account_id, {'event_id': event.id})
+
+
+@lru_cache(maxsize=256)
+def get_event_message(account_id, event_id):
+    # built once per process for all of the account's subscribers; the balance is the
+    # account's balance when the notice is received, and the id doubles as a
+    # transactions/changes/ cursor
+    event = OutboxEvent.objects.using(get_shard(account_id)).filter(account_id=account_id, pk=event_id).first()
+    if event is None:
+        return None
+
+    return {
+        'id': event.id,
+        'event': event.event_type,
+        'data': json.dumps({
+            'transaction_id': event.transaction_id,
+            'transaction': None if event.event_type == OutboxEvent.DELETED else event.payload,
+            'balance': get_account_totals(account_id),
+        }, cls=DjangoJSONEncoder),
+    }
+
+
+def format_sse(message):
+    lines = []
+    if message.get('id') is not None:
+        lines.append(f'id: {message["id"]}')
+    lines.append(f'event: {message["event"]}')
+    lines.extend(f'data: {line}' for line in message['data'].splitlines())
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventStream:
+    # async iterator of SSE text for a subscription, starting with the given messages;
+    # Django calls close() when the response ends or the client disconnects
+    def __init__(self, subscription, initial=(), heartbeat=15):
+        self.subscription = subscription
+        self.pending = list(initial)
+        self.heartbeat = heartbeat
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.pending:
+            return format_sse(self.pending.pop(0))
+
+        while True:
+            try:
+                notice = await self.subscription.get(timeout=self.heartbeat)
+            except asyncio.TimeoutError:
+                return ': keep-alive\n\n'
+
+            message = await sync_to_async(get_event_message)(self.subscription.account_id, notice['event_id'])
+            if message is not None:
+                return format_sse(message)
+
+    def close(self):
+        self.subscription.close()
@@ -0,0 +1,83 @@
+from datetime import date, datetime
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from investments_api.models import InvestmentAccount, Transaction
+from investments_api.analytics import top_rankings
+
+User = get_user_model()
+
+class TopRankingsTestCase(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.user2 = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        self.accounts = [
+            InvestmentAccount.objects.create(name=f'Investment Account {i}', permission=InvestmentAccount.FULL_CRUD)
+            for i in range(1, 4)
+        ]
+        self.day = lambda d: timezone.make_aware(datetime(2024, 1, d, 12))
+
+        account1, account2, account3 = self.accounts
+        self.create_transaction(account1, self.user1, 1, 500, 'credit')
+        self.create_transaction(account1, self.user1, 5, 400, 'debit')
+        self.create_transaction(account2, self.user2, 2, 300, 'credit')
+        self.create_transaction(account2, self.user1, 6, 50, 'credit')
+        self.create_transaction(account3, self.user2, 7, 20, 'credit')
+        self.create_transaction(account3, self.user2, 8, 10, 'credit')
+
+    def create_transaction(self, account, user, day, amount, transaction_type):
+        transaction = Transaction.objects.create(user=user, account=account, amount=amount, transaction_type=transaction_type)
+        Transaction.objects.filter(pk=transaction.pk).update(created_at=self.day(day))
+
+    def ranking(self, metric, **kwargs):
+        return [(row[kwargs.get('by', 'account')], row['value']) for row in top_rankings(metric, **kwargs)]
+
+    def test_sql_metrics(self):
+        account1, account2, account3 = [account.id for account in self.accounts]
+        self.assertEqual(self.ranking('balance'), [(account2, 350), (account1, 100), (account3, 30)])
+        self.assertEqual(self.ranking('outflow', limit=1), [(account1, 400)])
+        # ties are ordered by id
+        self.assertEqual(self.ranking('count', by='user'), sorted([(self.user1.id, 3), (self.user2.id, 3)]))
+        self.assertEqual(self.ranking('inflow', start_date=date(2024, 1, 6)), [(account2, 50), (account3, 30)])
+
+    def test_user_ranking_is_limited_in_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.ranking('inflow', by='user', limit=1), [(self.user1.id, 550)])
+        self.assertEqual(len(queries), 2)
+        self.assertIn('LIMIT 1', queries[0]['sql'])
+
+    def test_balance_is_as_of_end_date(self):
+        account1, account2, _ = [account.id for account in self.accounts]
+        self.assertEqual(self.ranking('balance', end_date=date(2024, 1, 4), limit=2), [(account1, 500), (account2, 300)])
+
+    def test_peak_balance_streams_with_opening_balances(self):
+        account1, account2, account3 = [account.id for account in self.accounts]
+        self.assertEqual(self.ranking('peak_balance'), [(account1, 500), (account2, 350), (account3, 30)])
+        # account1 opens at 500 and only falls inside the range; account2 has no
+        # transactions in the range but still has its opening balance
+        self.assertEqual(
+            self.ranking('peak_balance', start_date=date(2024, 1, 3), end_date=date(2024, 1, 5)),
+            [(account1, 500), (account2, 300)],
+        )
+        self.assertEqual(self.ranking('peak_balance', limit=1), [(account1, 500)])
+
+    def test_admin_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser(email='admin@gmail.com', password='Admin123'))
+
+        response = client.get('/api/admin/analytics/top/', {'metric': 'inflow', 'by': 'account', 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['label'], 'Investment Account 1')
+        self.assertEqual(response.data['results'][0]['rank'], 1)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = client.get('/api/admin/analytics/top/', {'metric': 'median'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        client.force_authenticate(self.user1)
+        response = client.get('/api/admin/analytics/top/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from investments_api.authentication import CachedJWTAuthentication, get_user_cache_key, get_user_cache_timeout, LOCAL_CACHE_MAX_TIMEOUT
+
+User = get_user_model()
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.user.groups.add(Group.objects.create(name='view_group'))
+        self.authentication = CachedJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+
+    def test_user_is_served_from_cache(self):
+        user = self.authentication.get_user(self.token)
+        self.assertEqual(user, self.user)
+
+        with self.assertNumQueries(0):
+            cached_user = self.authentication.get_user(self.token)
+            self.assertEqual(cached_user, self.user)
+            self.assertEqual([group.name for group in cached_user.groups.all()], ['view_group'])
+
+    def test_cache_is_invalidated_on_save_and_password_change(self):
+        self.authentication.get_user(self.token)
+
+        self.user.set_password('NewPassword123')
+        self.user.save()
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.pk)))
+
+        user = self.authentication.get_user(self.token)
+        self.assertTrue(user.check_password('NewPassword123'))
+
+    def test_cache_is_invalidated_on_group_change(self):
+        self.authentication.get_user(self.token)
+        self.user.groups.add(Group.objects.create(name='crud_group'))
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.pk)))
+
+    def test_cache_is_invalidated_on_group_permission_change(self):
+        group = self.user.groups.get()
+        permission = Permission.objects.get(codename='view_user')
+
+        self.authentication.get_user(self.token)
+        group.permissions.add(permission)
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.pk)))
+
+        self.authentication.get_user(self.token)
+        permission.group_set.clear()
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.pk)))
+
+        self.authentication.get_user(self.token)
+        group.delete()
+        self.assertIsNone(cache.get(get_user_cache_key(self.user.pk)))
+
+    @override_settings(JWT_USER_CACHE_TIMEOUT=300)
+    def test_per_process_cache_keeps_users_briefly(self):
+        self.assertEqual(get_user_cache_timeout(), LOCAL_CACHE_MAX_TIMEOUT)
+
+    def test_cache_is_invalidated_on_delete(self):
+        self.authentication.get_user(self.token)
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
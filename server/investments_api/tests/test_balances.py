@@ -0,0 +1,150 @@
+import uuid
+from datetime import timedelta
+from django.db.transaction import atomic
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction, BalanceCheckpoint
+from investments_api.serializers import TransactionSerializer
+from investments_api.balances import balance_as_of, create_checkpoints, get_totals
+
+User = get_user_model()
+
+class BalanceAsOfTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.other_user = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        self.now = timezone.now()
+
+    def create_transaction(self, days_ago, amount, transaction_type='credit', user=None):
+        transaction = Transaction.objects.create(
+            user=user or self.user, account=self.account, amount=amount, transaction_type=transaction_type
+        )
+        # created_at is auto_now_add, so backdate it directly
+        Transaction.objects.filter(pk=transaction.pk).update(created_at=self.now - timedelta(days=days_ago))
+        transaction.refresh_from_db()
+        return transaction
+
+    def assert_matches_full_scan(self, as_of, **filters):
+        expected = get_totals(Transaction.objects.filter(created_at__lte=as_of, **filters))
+        balance = balance_as_of(as_of, **filters)
+        self.assertEqual(balance['total_credits'], expected['total_credits'])
+        self.assertEqual(balance['total_debits'], expected['total_debits'])
+        return balance
+
+    def test_balance_from_checkpoints_and_delta(self):
+        self.create_transaction(30, 500)
+        self.create_transaction(20, 100, 'debit')
+        self.create_transaction(20, 70, user=self.other_user)
+        create_checkpoints(as_of=self.now - timedelta(days=15))
+
+        self.create_transaction(10, 50)
+        create_checkpoints(as_of=self.now - timedelta(days=5))
+        self.create_transaction(2, 25, 'debit')
+
+        self.assertEqual(BalanceCheckpoint.objects.filter(user=self.user).count(), 2)
+
+        for days_ago in (40, 25, 15, 12, 5, 1, 0):
+            self.assert_matches_full_scan(self.now - timedelta(days=days_ago), user=self.user)
+            self.assert_matches_full_scan(self.now - timedelta(days=days_ago), account=self.account)
+
+        balance = self.assert_matches_full_scan(self.now, user=self.user)
+        self.assertEqual(balance['balance'], 425)
+        self.assertEqual(balance['checkpoint'], self.now - timedelta(days=5))
+
+    def test_checkpoints_follow_updates_and_deletes(self):
+        credit = self.create_transaction(30, 500)
+        debit = self.create_transaction(20, 100, 'debit')
+        create_checkpoints(as_of=self.now - timedelta(days=15))
+
+        credit.amount = 800
+        credit.save()
+        debit.delete()
+
+        checkpoint = BalanceCheckpoint.objects.get(user=self.user)
+        self.assertEqual((checkpoint.total_credits, checkpoint.total_debits), (800, 0))
+        self.assertEqual(self.assert_matches_full_scan(self.now, user=self.user)['balance'], 800)
+
+    def test_transactions_keep_their_user_and_account(self):
+        credit = self.create_transaction(30, 100)
+        create_checkpoints(as_of=self.now - timedelta(days=15))
+
+        credit.user = self.other_user
+        with self.assertRaises(ValueError), atomic():
+            credit.save()
+        self.assertEqual(Transaction.objects.get(pk=credit.pk).user, self.user)
+        self.assertEqual(self.assert_matches_full_scan(self.now, user=self.user)['balance'], 100)
+        self.assertEqual(self.assert_matches_full_scan(self.now, user=self.other_user)['balance'], 0)
+
+        serializer = TransactionSerializer(Transaction.objects.get(pk=credit.pk), data={'user': self.other_user.pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('user', serializer.errors)
+
+    def test_admin_balance_endpoint(self):
+        admin = User.objects.create_superuser(email='admin@gmail.com', password='Admin123')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        self.create_transaction(30, 500)
+        self.create_transaction(1, 100, 'debit')
+        create_checkpoints(as_of=self.now - timedelta(days=15))
+
+        as_of = (self.now - timedelta(days=10)).date().isoformat()
+        response = client.get('/api/admin/balances/', {'user': str(self.user.id), 'as_of': as_of})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balance'], 500)
+
+        response = client.get(f'/api/admin/users/{self.user.id}/transactions/', {'as_of': as_of})
+        self.assertEqual(response.data['as_of_balance']['balance'], 500)
+        self.assertEqual(len(response.data['transactions']), 1)
+
+        response = client.get('/api/admin/balances/', {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AccountBalanceBatchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.view_group = Group.objects.create(name='view_group')
+        self.crud_group = Group.objects.create(name='crud_group')
+        self.user.groups.add(self.view_group, self.crud_group)
+
+        self.accounts = [
+            InvestmentAccount.objects.create(name=f'Investment Account {i}', permission=permission)
+            for i, permission in enumerate([InvestmentAccount.VIEW, InvestmentAccount.FULL_CRUD, InvestmentAccount.POST_ONLY, InvestmentAccount.VIEW])
+        ]
+        # a member of the first three accounts; POST_ONLY grants no read access
+        for account in self.accounts[:3]:
+            UserInvestmentAccount.objects.create(user=self.user, investment_account=account)
+            Transaction.objects.create(user=self.user, account=account, amount=100, transaction_type='credit')
+        Transaction.objects.create(user=self.user, account=self.accounts[1], amount=40, transaction_type='debit')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_balances_for_readable_accounts(self):
+        empty_account = InvestmentAccount.objects.create(name='Empty Account', permission=InvestmentAccount.VIEW)
+        UserInvestmentAccount.objects.create(user=self.user, investment_account=empty_account)
+        ids = [str(account.id) for account in [*self.accounts, empty_account]]
+
+        # memberships, groups and one grouped aggregate, however many accounts
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/investment-accounts/balances/', {'accounts': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'account': self.accounts[0].id, 'total_credits': 100, 'total_debits': 0, 'balance': 100},
+            {'account': self.accounts[1].id, 'total_credits': 100, 'total_debits': 40, 'balance': 60},
+            {'account': empty_account.id, 'total_credits': 0, 'total_debits': 0, 'balance': 0},
+        ])
+
+    def test_batch_size_is_limited(self):
+        response = self.client.post('/api/investment-accounts/balances/', {'accounts': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/api/investment-accounts/balances/', {'accounts': [str(uuid.uuid4()) for _ in range(201)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
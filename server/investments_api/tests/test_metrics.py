@@ -0,0 +1,87 @@
+import json
+import tempfile
+import threading
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from investments_api.models import InvestmentAccount, Transaction
+from investments_api.metrics import Registry, Counter, Histogram, registry
+
+User = get_user_model()
+
+class MetricsRegistryTestCase(APITestCase):
+    def test_text_exposition(self):
+        registry = Registry()
+        counter = Counter(registry, 'jobs_total', 'Jobs.', ['queue'])
+        histogram = Histogram(registry, 'job_seconds', 'Job latency.', ['queue'], buckets=(0.1, 1))
+        counter.inc(queue='a')
+        counter.inc(2, queue='a')
+        histogram.observe(0.5, queue='a')
+
+        output = registry.render()
+        self.assertIn('# TYPE jobs_total counter', output)
+        self.assertIn('jobs_total{queue="a"} 3', output)
+        self.assertIn('job_seconds_bucket{queue="a",le="0.1"} 0', output)
+        self.assertIn('job_seconds_bucket{queue="a",le="1"} 1', output)
+        self.assertIn('job_seconds_bucket{queue="a",le="+Inf"} 1', output)
+        self.assertIn('job_seconds_count{queue="a"} 1', output)
+
+    def test_multiprocess_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            worker = Registry()
+            Counter(worker, 'jobs_total', 'Jobs.').inc(2)
+            worker.flush()
+
+            # another process writing the same metric
+            (Path(directory) / 'metrics_1.json').write_text(json.dumps([['jobs_total', [], 3]]))
+
+            self.assertIn('jobs_total 5', worker.render())
+
+
+class MetricsEndpointTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.VIEW)
+
+    def test_request_and_domain_metrics(self):
+        Transaction.objects.create(user=self.user, account=self.account, amount=100, transaction_type='credit')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = self.client.get(f'/api/investment-accounts/{self.account.id}/transactions/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        output = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="transaction-list-create",method="GET",status="403"}', output)
+        self.assertIn('db_queries_total{view="transaction-list-create"}', output)
+        self.assertIn('transactions_created_total{transaction_type="credit"}', output)
+        self.assertIn('permission_denials_total{check="has_permission"}', output)
+        self.assertIn('cache_requests_total{cache="jwt_user",result="miss"}', output)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MetricsThreadTestCase(TransactionTestCase):
+    def test_queries_are_counted_on_a_fresh_thread(self):
+        key = ('db_queries_total', ('investment-account-list',))
+        before = registry.collect().get(key, 0)
+
+        def request():
+            try:
+                self.client.get('/api/investment-accounts/')
+            finally:
+                connections.close_all()
+
+        # the thread has no open connection when the middleware starts
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+        self.assertGreater(registry.collect().get(key, 0), before)
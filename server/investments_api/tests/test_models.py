@@ -1,6 +1,10 @@
-from django.test import TestCase
+import uuid
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
 from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction
+from investments_api.provisioning import hash_passwords, provision_users
+from investments_api.uuids import uuid7
 
 User = get_user_model()
 
@@ -109,3 +113,64 @@ class TransactionModelTest(TestCase):
         self.assertEqual(transaction.amount, 50)
         self.assertTrue(transaction.is_debit)
         self.assertFalse(transaction.is_credit)
+
+# Bulk provisioning
+# (the pool closes the parent's connections, so not inside a TestCase transaction)
+@override_settings(BULK_PROVISIONING_MIN_ITERATIONS=1000)
+class ParallelHashingTest(TransactionTestCase):
+    def test_hash_passwords_in_process_pool(self):
+        hashed = hash_passwords(['Password1', 'Password2', 'Password3'], iterations=1000, workers=2, chunk_size=1)
+        self.assertEqual(len(hashed), 3)
+        self.assertTrue(check_password('Password2', hashed[1]))
+
+
+@override_settings(BULK_PROVISIONING_MIN_ITERATIONS=1000)
+class BulkProvisioningTest(TestCase):
+    def test_pool_runs_serially_inside_a_transaction(self):
+        hashed = hash_passwords(['Password1', 'Password2'], iterations=1000, workers=2, chunk_size=1)
+        self.assertTrue(check_password('Password1', hashed[0]))
+        # the test transaction's connection is still usable
+        User.objects.create_user(email='johndoe@gmail.com', password='JohnDoe123')
+        self.assertTrue(User.objects.filter(email='johndoe@gmail.com').exists())
+
+    def test_rejects_iterations_below_the_floor(self):
+        with self.assertRaises(ValueError):
+            hash_passwords(['Password1'], iterations=999)
+        with override_settings(BULK_PROVISIONING_MIN_ITERATIONS=None), self.assertRaises(ValueError):
+            hash_passwords(['Password1'], iterations=1000)
+
+    def test_provision_users_rejects_non_string_fields(self):
+        results = provision_users([
+            {'email': 123, 'password': 'Password1'},
+            {'email': 'bulk1@gmail.com', 'password': 'Password1', 'first_name': ['Bulk']},
+            {'email': 'bulk2@gmail.com', 'password': 'Password2', 'last_name': 'x' * 151},
+        ], iterations=1000, workers=1)
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'error'])
+        self.assertIn('email', results[0]['errors'])
+        self.assertIn('first_name', results[1]['errors'])
+        self.assertIn('last_name', results[2]['errors'])
+
+    def test_provision_users(self):
+        results = provision_users([
+            {'email': 'bulk1@gmail.com', 'password': 'Password1'},
+            {'email': 'bulk2@gmail.com', 'password': 'Password2'},
+        ], iterations=1000, workers=1)
+        self.assertEqual([result['status'] for result in results], ['created', 'created'])
+        self.assertEqual(User.objects.filter(email__startswith='bulk').count(), 2)
+
+
+class UUID7Test(TestCase):
+    def test_version_and_ordering(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertTrue(all(value.version == 7 and value.variant == uuid.RFC_4122 for value in ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_transaction_ids_follow_insert_order(self):
+        user = get_user_model().objects.create_user(email='johndoe@gmail.com', password='JohnDoe123')
+        account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        created = [
+            Transaction.objects.create(user=user, account=account, amount=amount, transaction_type='credit').id
+            for amount in range(1, 6)
+        ]
+        self.assertEqual(list(Transaction.objects.order_by('id').values_list('id', flat=True)), created)
@@ -0,0 +1,204 @@
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction, OutboxEvent
+from investments_api.outbox import QueueSink, relay
+
+User = get_user_model()
+
+class FlakySink(QueueSink):
+    def __init__(self, failing_accounts):
+        super().__init__()
+        self.failing_accounts = failing_accounts
+
+    def send(self, messages):
+        if messages[0]['account_id'] in self.failing_accounts:
+            raise ConnectionError('sink unavailable')
+        super().send(messages)
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.account1 = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        self.account2 = InvestmentAccount.objects.create(name='Investment Account 2', permission=InvestmentAccount.FULL_CRUD)
+
+    def drain(self, sink):
+        messages = []
+        while not sink.queue.empty():
+            messages.append(sink.queue.get())
+        return messages
+
+    def test_events_for_create_update_delete(self):
+        tx = Transaction.objects.create(user=self.user, account=self.account1, amount=100, transaction_type='credit')
+        tx.amount = 150
+        tx.save()
+        transaction_id = tx.id
+        tx.delete()
+
+        events = list(OutboxEvent.objects.order_by('id'))
+        self.assertEqual([event.event_type for event in events], [OutboxEvent.CREATED, OutboxEvent.UPDATED, OutboxEvent.DELETED])
+        self.assertEqual(events[1].payload['amount'], 150)
+        self.assertEqual(events[2].transaction_id, transaction_id)
+
+    def test_event_rolls_back_with_the_transaction(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Transaction.objects.create(user=self.user, account=self.account1, amount=100, transaction_type='credit')
+            raise RuntimeError
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_relay_delivers_in_order_per_account(self):
+        for amount in (1, 2, 3):
+            Transaction.objects.create(user=self.user, account=self.account1, amount=amount, transaction_type='credit')
+        Transaction.objects.create(user=self.user, account=self.account2, amount=4, transaction_type='debit')
+
+        sink = QueueSink()
+        self.assertEqual(relay(sink), (4, 0))
+        messages = self.drain(sink)
+        self.assertEqual([message['payload']['amount'] for message in messages], [1, 2, 3, 4])
+        self.assertFalse(OutboxEvent.objects.filter(delivered_at__isnull=True).exists())
+        self.assertEqual(relay(sink), (0, 0))
+
+    def test_relay_follows_commit_order(self):
+        first = Transaction.objects.create(user=self.user, account=self.account1, amount=1, transaction_type='credit')
+        Transaction.objects.create(user=self.user, account=self.account1, amount=2, transaction_type='credit')
+
+        # the first event's insert took the lower id, but its transaction commits last
+        late = OutboxEvent.objects.get(transaction_id=first.id)
+        OutboxEvent.objects.filter(pk=late.pk).delete()
+        sink = QueueSink()
+        self.assertEqual(relay(sink), (1, 0))
+
+        late.save(force_insert=True)
+        self.assertEqual(relay(sink), (1, 0))
+        messages = self.drain(sink)
+        self.assertEqual([message['payload']['amount'] for message in messages], [2, 1])
+        self.assertLess(messages[0]['sequence'], messages[1]['sequence'])
+
+    def test_delivered_events_are_pruned(self):
+        for amount in (1, 2):
+            Transaction.objects.create(user=self.user, account=self.account1, amount=amount, transaction_type='credit')
+        relay(QueueSink())
+        Transaction.objects.create(user=self.user, account=self.account1, amount=3, transaction_type='credit')
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(days=10))
+        OutboxEvent.objects.filter(delivered_at__isnull=False).update(delivered_at=timezone.now() - timedelta(days=8))
+
+        call_command('relay_outbox', sink='queue', prune_after=7, once=True, stdout=StringIO())
+        # the undelivered event is kept, then delivered by the same pass
+        self.assertEqual([event.payload['amount'] for event in OutboxEvent.objects.all()], [3])
+        self.assertIsNotNone(OutboxEvent.objects.get().delivered_at)
+
+    def test_failed_account_is_retried_with_backoff(self):
+        Transaction.objects.create(user=self.user, account=self.account1, amount=1, transaction_type='credit')
+        Transaction.objects.create(user=self.user, account=self.account1, amount=2, transaction_type='credit')
+        Transaction.objects.create(user=self.user, account=self.account2, amount=3, transaction_type='credit')
+
+        sink = FlakySink({str(self.account1.id)})
+        self.assertEqual(relay(sink), (1, 2))
+        head = OutboxEvent.objects.filter(account_id=self.account1.id).order_by('id').first()
+        self.assertEqual(head.attempts, 1)
+        self.assertIn('sink unavailable', head.last_error)
+        self.assertGreater(head.next_attempt_at, timezone.now())
+
+        # the account stays blocked until its retry is due, even once the sink recovers
+        sink.failing_accounts.clear()
+        Transaction.objects.create(user=self.user, account=self.account1, amount=4, transaction_type='credit')
+        self.assertEqual(relay(sink), (0, 0))
+
+        OutboxEvent.objects.filter(pk=head.pk).update(next_attempt_at=timezone.now())
+        self.drain(sink)
+        self.assertEqual(relay(sink), (3, 0))
+        self.assertEqual([message['payload']['amount'] for message in self.drain(sink)], [1, 2, 4])
+
+    def test_relay_outbox_command_file_sink(self):
+        Transaction.objects.create(user=self.user, account=self.account1, amount=100, transaction_type='credit')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'events.jsonl'
+            call_command('relay_outbox', sink='file', target=str(path), once=True, stdout=StringIO())
+            lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['type'], OutboxEvent.CREATED)
+        self.assertEqual(lines[0]['account_id'], str(self.account1.id))
+
+
+class TransactionChangesTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        permission, _ = Permission.objects.get_or_create(
+            codename='can_only_read_transactions',
+            name='Can only view transactions',
+            content_type=ContentType.objects.get_for_model(InvestmentAccount)
+        )
+        group = Group.objects.create(name='view_group')
+        group.permissions.add(permission)
+        self.user.groups.add(group)
+
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.VIEW)
+        UserInvestmentAccount.objects.create(user=self.user, investment_account=self.account)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('transaction-changes', kwargs={'account_id': self.account.id})
+
+    def test_changes_since_cursor_with_tombstones(self):
+        first = Transaction.objects.create(user=self.user, account=self.account, amount=100, transaction_type='credit')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertFalse(response.data['has_more'])
+        cursor = response.data['next_cursor']
+
+        second = Transaction.objects.create(user=self.user, account=self.account, amount=200, transaction_type='debit')
+        first.delete()
+        other_account = InvestmentAccount.objects.create(name='Investment Account 2', permission=InvestmentAccount.VIEW)
+        Transaction.objects.create(user=self.user, account=other_account, amount=300, transaction_type='credit')
+
+        response = self.client.get(self.url, {'since': cursor, 'limit': 1})
+        self.assertEqual([change['transaction']['id'] for change in response.data['results']], [str(second.id)])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'since': response.data['next_cursor']})
+        tombstone = response.data['results'][0]
+        self.assertTrue(tombstone['deleted'])
+        self.assertIsNone(tombstone['transaction'])
+        self.assertEqual(tombstone['event_type'], OutboxEvent.DELETED)
+        self.assertFalse(response.data['has_more'])
+
+    def test_late_commit_is_not_skipped(self):
+        first = Transaction.objects.create(user=self.user, account=self.account, amount=100, transaction_type='credit')
+        second = Transaction.objects.create(user=self.user, account=self.account, amount=200, transaction_type='credit')
+
+        # the first event's insert took the lower id, but its transaction commits last
+        late = OutboxEvent.objects.get(transaction_id=first.id)
+        OutboxEvent.objects.filter(pk=late.pk).delete()
+        response = self.client.get(self.url)
+        self.assertEqual([change['transaction']['id'] for change in response.data['results']], [str(second.id)])
+        cursor = response.data['next_cursor']
+
+        late.save(force_insert=True)
+        self.assertLess(late.id, OutboxEvent.objects.get(transaction_id=second.id).id)
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual([change['transaction']['id'] for change in response.data['results']], [str(first.id)])
+        self.assertGreater(response.data['next_cursor'], cursor)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_member_is_denied(self):
+        outsider = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
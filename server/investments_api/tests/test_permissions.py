@@ -1,9 +1,12 @@
+from unittest import skipUnless
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission, Group
 from django.contrib.contenttypes.models import ContentType
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -193,3 +196,103 @@ class TransactionAPIPermissionsTestCase(APITestCase):
             'transaction_type': 'credit'
         })
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_transaction_list_filters(self):
+        refresh = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        Transaction.objects.create(user=self.user2, account=self.account2, amount=50, description="Transaction 3", transaction_type='credit')
+
+        response = self.client.get(reverse('transaction-list-create', kwargs={'account_id': self.account2.id}), {
+            'transaction_type': 'credit',
+            'created_after': '2000-01-01T00:00:00Z',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([transaction['description'] for transaction in response.data], ['Transaction 3'])
+
+
+    def test_transaction_list_user_filter_does_not_list_users(self):
+        refresh = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        url = reverse('transaction-list-create', kwargs={'account_id': self.account2.id})
+
+        response = self.client.get(url, {'user': self.user2.id})
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get(url, {'user': self.user1.id})
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.user1.email, response.content.decode())
+
+    def test_member_transaction_sparse_fields(self):
+        refresh = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        list_url = reverse('transaction-list-create', kwargs={'account_id': self.account2.id})
+
+        def count_list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(list_url, {'fields': 'id,amount'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(set(response.data[0]), {'id', 'amount'})
+            return len(queries)
+
+        count_list_queries()  # warms the cached JWT user
+        queries = count_list_queries()
+        for amount in range(5):
+            Transaction.objects.create(user=self.user2, account=self.account2, amount=amount + 1, transaction_type='credit')
+        # deferred account_id/user_id would be loaded once per row
+        self.assertEqual(count_list_queries(), queries)
+
+        detail_url = reverse('transaction-detail', kwargs={'account_id': self.account2.id, 'pk': self.transaction2.id})
+        response = self.client.get(detail_url, {'fields': 'id,amount'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': str(self.transaction2.id), 'amount': 200})
+
+
+    def test_transaction_search(self):
+        refresh = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        Transaction.objects.create(user=self.user2, account=self.account2, amount=50, description="Quarterly dividend payout", transaction_type='credit')
+        Transaction.objects.create(user=self.user2, account=self.account2, amount=75, description="Dividends reinvested", transaction_type='debit')
+        Transaction.objects.create(user=self.user1, account=self.account1, amount=75, description="Dividend in another account", transaction_type='credit')
+
+        url = reverse('transaction-search', kwargs={'account_id': self.account2.id})
+        response = self.client.get(url, {'q': 'dividend'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            sorted(transaction['description'] for transaction in response.data['results']),
+            ['Dividends reinvested', 'Quarterly dividend payout']
+        )
+
+        response = self.client.get(url, {'q': 'quarterly "dividend', 'page_size': 1})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['description'], 'Quarterly dividend payout')
+
+        Transaction.objects.filter(description='Dividends reinvested').update(description='Reinvested')
+        Transaction.objects.filter(description='Quarterly dividend payout').delete()
+        response = self.client.get(url, {'q': 'dividend'})
+        self.assertEqual(response.data['count'], 0)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 index')
+    def test_transaction_search_survives_rowid_renumbering(self):
+        refresh = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + str(refresh.access_token))
+        dividend = Transaction.objects.create(user=self.user2, account=self.account2, amount=50, description='Dividend payout', transaction_type='credit')
+        salary = Transaction.objects.create(user=self.user2, account=self.account2, amount=75, description='Salary', transaction_type='credit')
+
+        # what VACUUM or a table rebuild may do to the implicit rowids
+        table = Transaction._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id, rowid FROM {table} WHERE id IN (%s, %s)', [dividend.id.hex, salary.id.hex])
+            rowids = dict(cursor.fetchall())
+            cursor.execute(f'UPDATE {table} SET rowid = -rowid WHERE id IN (%s, %s)', [dividend.id.hex, salary.id.hex])
+            cursor.execute(f'UPDATE {table} SET rowid = %s WHERE id = %s', [rowids[salary.id.hex], dividend.id.hex])
+            cursor.execute(f'UPDATE {table} SET rowid = %s WHERE id = %s', [rowids[dividend.id.hex], salary.id.hex])
+
+        url = reverse('transaction-search', kwargs={'account_id': self.account2.id})
+        response = self.client.get(url, {'q': 'dividend'})
+        self.assertEqual([transaction['id'] for transaction in response.data['results']], [str(dividend.id)])
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from investments_api.models import InvestmentAccount, Transaction
+
+User = get_user_model()
+
+class ProfilingMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        self.profiles_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PROFILING_DIR=self.profiles_dir.name)
+        self.settings_override.enable()
+
+        self.admin_user = User.objects.create_superuser(email='admin@gmail.com', password='Admin123')
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        Transaction.objects.create(user=self.user, account=account, amount=100, transaction_type='credit')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.profiles_dir.cleanup()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def test_staff_can_profile_a_request(self):
+        self.authenticate(self.admin_user)
+        response = self.client.get(f'/api/admin/users/{self.user.id}/transactions/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response['X-Profile-Id']
+
+        response = self.client.get(f'/api/admin/profiles/{profile_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['path'], f'/api/admin/users/{self.user.id}/transactions/')
+        self.assertGreater(response.data['query_count'], 0)
+        self.assertIn('investments_api_transaction', ' '.join(query['sql'] for query in response.data['queries']))
+        self.assertTrue(response.data['functions'])
+
+        response = self.client.get(f'/api/admin/profiles/{profile_id}/', {'download': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content))
+
+    def test_query_flag_and_non_staff(self):
+        self.authenticate(self.admin_user)
+        response = self.client.get('/api/investment-accounts/', {'profile': 1})
+        self.assertIn('X-Profile-Id', response)
+
+        self.authenticate(self.user)
+        response = self.client.get('/api/investment-accounts/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+
+        response = self.client.get('/api/admin/profiles/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_old_profiles_are_deleted(self):
+        profiles_dir = Path(self.profiles_dir.name)
+        old_profile = profiles_dir / '00000000-0000-0000-0000-000000000000.prof'
+        old_summary = old_profile.with_suffix('.json')
+        for path in (old_profile, old_summary):
+            path.touch()
+            os.utime(path, (time.time() - 2 * 86400, time.time() - 2 * 86400))
+
+        self.authenticate(self.admin_user)
+        response = self.client.get('/api/investment-accounts/', HTTP_X_PROFILE='1')
+        profile_id = response['X-Profile-Id']
+        self.assertEqual(sorted(path.name for path in profiles_dir.iterdir()), [f'{profile_id}.json', f'{profile_id}.prof'])
@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+from io import StringIO
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from investments_api.models import InvestmentAccount, Transaction, ReconciliationRun
+from investments_api.balances import create_checkpoints
+from investments_api.statements import generate_statements
+from investments_api.reconciliation import reconcile
+
+User = get_user_model()
+
+class ReconciliationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.accounts = [
+            InvestmentAccount.objects.create(name=f'Investment Account {i}', permission=InvestmentAccount.FULL_CRUD)
+            for i in range(3)
+        ]
+        for account in self.accounts:
+            self.create_transaction(account, datetime(2024, 1, 10), 500, 'credit')
+            self.create_transaction(account, datetime(2024, 2, 3), 200, 'debit')
+
+        generate_statements(date(2024, 1, 1), [account.id for account in self.accounts], workers=1)
+        generate_statements(date(2024, 2, 1), [account.id for account in self.accounts], workers=1)
+        create_checkpoints(as_of=timezone.now() - timedelta(seconds=1))
+
+    def create_transaction(self, account, created_at, amount, transaction_type):
+        transaction = Transaction.objects.create(user=self.user, account=account, amount=amount, transaction_type=transaction_type)
+        Transaction.objects.filter(pk=transaction.pk).update(created_at=timezone.make_aware(created_at))
+
+    def test_consistent_ledger_has_no_mismatches(self):
+        run = reconcile(ReconciliationRun.objects.create(chunk_size=2), workers=1)
+        self.assertEqual(run.status, ReconciliationRun.COMPLETED)
+        self.assertEqual(run.accounts_checked, 3)
+        self.assertEqual(run.mismatches, [])
+
+    def test_reports_mismatches(self):
+        account = self.accounts[0]
+        # bypass the signals that keep stored balances in sync
+        Transaction.objects.filter(account=account, transaction_type='debit').update(amount=250)
+
+        run = reconcile(ReconciliationRun.objects.create(chunk_size=2), workers=1)
+        self.assertEqual(
+            sorted((mismatch['kind'], mismatch['account']) for mismatch in run.mismatches),
+            [('checkpoint', str(account.id)), ('statement', str(account.id))]
+        )
+        statement = next(mismatch for mismatch in run.mismatches if mismatch['kind'] == 'statement')
+        self.assertEqual(statement['month'], '2024-02')
+        self.assertEqual(statement['ledger']['closing_balance'], 250)
+
+    def test_resume_skips_completed_chunks(self):
+        account_ids = sorted(account.id for account in self.accounts)
+        run = ReconciliationRun.objects.create(chunk_size=2, last_account_id=account_ids[1], accounts_checked=2)
+
+        call_command('reconcile_ledger', '--resume', '--workers', '1', stdout=StringIO())
+        run.refresh_from_db()
+        self.assertEqual(run.status, ReconciliationRun.COMPLETED)
+        self.assertEqual(run.accounts_checked, 3)
+        self.assertEqual(run.last_account_id, account_ids[2])
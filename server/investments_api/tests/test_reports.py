@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from investments_api.models import InvestmentAccount, Transaction, ReportJob
+from investments_api.reports import ReportJobLost, claim_next_job, prune_reports, run_job
+
+User = get_user_model()
+
+class ReportJobTestCase(TestCase):
+    def setUp(self):
+        self.reports_dir = tempfile.TemporaryDirectory()
+        self.reports_dir_path = Path(self.reports_dir.name)
+        self.settings_override = override_settings(REPORTS_DIR=self.reports_dir.name)
+        self.settings_override.enable()
+
+        self.admin_user = User.objects.create_superuser(email='admin@gmail.com', password='Admin123')
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        for day, amount, transaction_type in [(1, 500, 'credit'), (2, 100, 'debit'), (3, 50, 'credit'), (10, 25, 'debit'), (20, 5, 'credit')]:
+            tx = Transaction.objects.create(user=self.user, account=account, amount=amount, transaction_type=transaction_type)
+            Transaction.objects.filter(pk=tx.pk).update(created_at=timezone.make_aware(datetime(2024, 1, day, 12)))
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin_user)
+        self.url = f'/api/admin/users/{self.user.id}/transactions/reports/'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.reports_dir.cleanup()
+
+    def run_worker(self):
+        call_command('run_report_worker', once=True, chunk_size=2, stdout=StringIO())
+
+    def test_report_job_lifecycle(self):
+        response = self.client.post(self.url, {'start_date': '2024-01-01', 'end_date': '2024-01-10'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['id']
+        self.assertEqual(response.data['status'], ReportJob.PENDING)
+        self.assertEqual(response['Location'], f'/api/admin/reports/{job_id}/')
+
+        response = self.client.get(f'/api/admin/reports/{job_id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        self.run_worker()
+
+        response = self.client.get(f'/api/admin/reports/{job_id}/')
+        self.assertEqual(response.data['status'], ReportJob.COMPLETED)
+        self.assertEqual(response.data['rows_written'], 4)
+        self.assertEqual(response.data['total_balance'], 425)
+        self.assertTrue(response.data['download_url'].endswith(f'/api/admin/reports/{job_id}/download/'))
+
+        response = self.client.get(f'/api/admin/reports/{job_id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(report['total_balance'], 425)
+        self.assertEqual([row['amount'] for row in report['transactions']], [500, 100, 50, 25])
+
+    def test_identical_requests_share_a_job(self):
+        first = self.client.post(self.url, {'transaction_type': 'credit'}, format='json')
+        second = self.client.post(self.url, {'transaction_type': 'credit'}, format='json')
+        other = self.client.post(self.url, {'transaction_type': 'debit'}, format='json')
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertNotEqual(first.data['id'], other.data['id'])
+
+        # only while active: a finished report can be requested again
+        self.run_worker()
+        again = self.client.post(self.url, {'transaction_type': 'credit'}, format='json')
+        self.assertEqual(again.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(again.data['id'], first.data['id'])
+
+    def test_active_dedup_key_is_unique(self):
+        job = ReportJob.objects.create(user=self.user, dedup_key='same')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ReportJob.objects.create(user=self.user, dedup_key='same')
+
+        ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.FAILED)
+        ReportJob.objects.create(user=self.user, dedup_key='same')
+
+    def test_stale_running_job_is_requeued(self):
+        response = self.client.post(self.url, {}, format='json')
+        ReportJob.objects.filter(pk=response.data['id']).update(
+            status=ReportJob.RUNNING, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.run_worker()
+        job = ReportJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, ReportJob.COMPLETED)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(REPORT_JOB_MAX_ATTEMPTS=2)
+    def test_stale_job_fails_after_max_attempts(self):
+        response = self.client.post(self.url, {}, format='json')
+        ReportJob.objects.filter(pk=response.data['id']).update(
+            status=ReportJob.RUNNING, attempts=2, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertIsNone(claim_next_job())
+
+        job = ReportJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, ReportJob.FAILED)
+        self.assertIn('2 attempts', job.error)
+
+    def test_superseded_worker_stops_without_writing(self):
+        self.client.post(self.url, {}, format='json')
+        job = claim_next_job()
+
+        # requeued and claimed by another worker while the first one runs
+        ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.PENDING, worker_token=None)
+        current = claim_next_job()
+        self.assertNotEqual(current.worker_token, job.worker_token)
+        self.assertEqual(current.attempts, 2)
+
+        with self.assertRaises(ReportJobLost):
+            run_job(job, chunk_size=2)
+        current.refresh_from_db()
+        self.assertEqual((current.status, current.rows_written), (ReportJob.RUNNING, 0))
+        self.assertEqual(list(self.reports_dir_path.iterdir()), [])
+
+        run_job(current, chunk_size=2)
+        current.refresh_from_db()
+        self.assertEqual(current.status, ReportJob.COMPLETED)
+        self.assertEqual([path.name for path in self.reports_dir_path.iterdir()], [current.result_file])
+
+    def test_old_reports_are_pruned(self):
+        self.client.post(self.url, {'transaction_type': 'credit'}, format='json')
+        self.client.post(self.url, {'transaction_type': 'debit'}, format='json')
+        self.run_worker()
+        old, recent = ReportJob.objects.order_by('created_at')
+        ReportJob.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=30))
+
+        # a killed worker's temporary file, and one still being written
+        stale_tmp = self.reports_dir_path / 'stale.json.tmp'
+        fresh_tmp = self.reports_dir_path / 'fresh.json.tmp'
+        for path in (stale_tmp, fresh_tmp, self.reports_dir_path / old.result_file, self.reports_dir_path / recent.result_file):
+            path.touch()
+            if path != fresh_tmp:
+                timestamp = (timezone.now() - timedelta(days=30)).timestamp()
+                os.utime(path, (timestamp, timestamp))
+
+        self.assertEqual(prune_reports(timedelta(days=7)), 1)
+        self.assertEqual(list(ReportJob.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(sorted(path.name for path in self.reports_dir_path.iterdir()), sorted([recent.result_file, 'fresh.json.tmp']))
+
+    def test_worker_sweeps_old_reports(self):
+        job = ReportJob.objects.create(user=self.user, dedup_key='old', status=ReportJob.FAILED, finished_at=timezone.now() - timedelta(days=30))
+        output = StringIO()
+        call_command('run_report_worker', once=True, keep_days=7, stdout=output)
+        self.assertFalse(ReportJob.objects.filter(pk=job.pk).exists())
+        self.assertIn('1 finished reports deleted', output.getvalue())
+
+    def test_requires_admin_and_existing_user(self):
+        response = self.client.post('/api/admin/users/00000000-0000-0000-0000-000000000000/transactions/reports/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -107,3 +107,7 @@ class SerializerTests(TestCase):
         serializer = TransactionSerializer(data=data)
         self.assertFalse(serializer.is_valid())
         self.assertIn('amount', serializer.errors)
+
+    def test_user_investment_account_slug_field_renders_as_text_input(self):
+        field = UserInvestmentAccountSerializer().fields['user']
+        self.assertEqual(field.style['base_template'], 'input.html')
@@ -0,0 +1,158 @@
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction
+from investments_api.series import downsample_lttb, downsample_minmax
+
+User = get_user_model()
+
+class DownsampleTest(SimpleTestCase):
+    def setUp(self):
+        start = timezone.now()
+        values = [0, 5, 1, 2, 40, 3, 2, 1, -30, 4, 3, 2, 5, 6, 1, 0, 2, 3, 9, 1]
+        self.points = [(start + timedelta(minutes=i), value) for i, value in enumerate(values)]
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        series = list(downsample_lttb(iter(self.points), len(self.points), 6))
+        self.assertEqual(len(series), 6)
+        self.assertEqual(series[0], self.points[0])
+        self.assertEqual(series[-1], self.points[-1])
+        self.assertEqual(series, sorted(series))
+        values = [value for _, value in series]
+        self.assertIn(40, values)
+        self.assertIn(-30, values)
+
+    def test_minmax_keeps_bucket_extremes(self):
+        series = list(downsample_minmax(iter(self.points), len(self.points), 4))
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series, sorted(series))
+        self.assertEqual([value for _, value in series], [40, -30, 0, 9])
+
+    def test_short_series_is_returned_whole(self):
+        for downsample in (downsample_lttb, downsample_minmax):
+            self.assertEqual(list(downsample(iter(self.points), len(self.points), 20)), self.points)
+
+    def test_lttb_tolerates_rows_vanishing_after_count(self):
+        series = list(downsample_lttb(iter(self.points[:10]), len(self.points), 6))
+        self.assertEqual(series[0], self.points[0])
+        self.assertEqual(series[-1], self.points[9])
+
+
+class AccountBalanceSeriesTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        permission, _ = Permission.objects.get_or_create(
+            codename='can_only_read_transactions',
+            name='Can only view transactions',
+            content_type=ContentType.objects.get_for_model(InvestmentAccount)
+        )
+        group = Group.objects.create(name='view_group')
+        group.permissions.add(permission)
+        self.user.groups.add(group)
+
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.VIEW)
+        UserInvestmentAccount.objects.create(user=self.user, investment_account=self.account)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('account-balance-series', kwargs={'account_id': self.account.id})
+
+        # alternating credits and debits, one per day, ending yesterday
+        self.now = timezone.now()
+        for day in range(30):
+            transaction_type = 'credit' if day % 3 else 'debit'
+            transaction = Transaction.objects.create(
+                user=self.user, account=self.account, amount=10 * (day + 1), transaction_type=transaction_type
+            )
+            Transaction.objects.filter(pk=transaction.pk).update(created_at=self.now - timedelta(days=30 - day))
+
+        other_account = InvestmentAccount.objects.create(name='Investment Account 2', permission=InvestmentAccount.VIEW)
+        Transaction.objects.create(user=self.user, account=other_account, amount=999, transaction_type='credit')
+
+    def expected_balances(self):
+        balance, balances = 0, []
+        for transaction in Transaction.objects.filter(account=self.account).order_by('created_at', 'id'):
+            balance += transaction.amount if transaction.transaction_type == 'credit' else -transaction.amount
+            balances.append(balance)
+        return balances
+
+    def test_full_series_is_a_running_sum(self):
+        response = self.client.get(self.url, {'points': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual([point['balance'] for point in response.data['points']], self.expected_balances())
+
+    def test_series_is_downsampled_to_requested_points(self):
+        expected = self.expected_balances()
+        for method in ('lttb', 'minmax'):
+            response = self.client.get(self.url, {'points': 10, 'method': method})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            points = response.data['points']
+            self.assertLessEqual(len(points), 10)
+            self.assertTrue(set(point['balance'] for point in points) <= set(expected))
+            self.assertIn(max(expected), [point['balance'] for point in points])
+
+    def test_date_range_carries_opening_balance(self):
+        start = (self.now - timedelta(days=10)).date()
+        response = self.client.get(self.url, {'points': 100, 'start_date': start.isoformat()})
+        expected = self.expected_balances()
+        in_range = Transaction.objects.filter(account=self.account, created_at__date__gte=start).count()
+        self.assertEqual(response.data['count'], in_range)
+        self.assertEqual([point['balance'] for point in response.data['points']], expected[-in_range:])
+        self.assertEqual(response.data['opening_balance'], expected[-in_range - 1])
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.url, {'points': 2})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'start_date': date(2024, 2, 1), 'end_date': date(2024, 1, 1)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_member_is_denied(self):
+        stranger = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        self.client.force_authenticate(stranger)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UserBalanceSeriesTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.other_user = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        self.accounts = [
+            InvestmentAccount.objects.create(name=f'Investment Account {index}', permission=InvestmentAccount.FULL_CRUD)
+            for index in range(2)
+        ]
+        self.url = reverse('user-balance-series', kwargs={'user_id': self.user.id})
+
+        # the user's credits alternate between the accounts; the other user's don't count
+        now = timezone.now()
+        for day in range(10):
+            for user in (self.user, self.other_user):
+                transaction = Transaction.objects.create(
+                    user=user, account=self.accounts[day % 2], amount=10, transaction_type='credit'
+                )
+                Transaction.objects.filter(pk=transaction.pk).update(created_at=now - timedelta(days=10 - day))
+
+    def test_series_covers_the_users_transactions_only(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, {'points': 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual([point['balance'] for point in response.data['points']], list(range(10, 110, 10)))
+
+        response = self.client.get(self.url, {'points': 100, 'account': self.accounts[1].id})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['points'][-1]['balance'], 50)
+
+    def test_only_the_user_and_admins_can_read_it(self):
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(User.objects.create_superuser(email='admin@gmail.com', password='Admin123'))
+        response = self.client.get(self.url, {'points': 3, 'method': 'minmax'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(response.data['points']), 3)
@@ -0,0 +1,201 @@
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction, OutboxEvent, BalanceCheckpoint, AccountStatement, ReconciliationRun
+from investments_api.routers import TransactionShardRouter, get_shard, scatter
+from investments_api.analytics import top_rankings
+from investments_api.balances import balance_as_of, create_checkpoints
+from investments_api.reconciliation import reconcile
+from investments_api.series import balance_series
+from investments_api.statements import generate_statements
+from investments_api import exports
+
+User = get_user_model()
+
+@override_settings(TRANSACTION_SHARDS=['shard_0', 'shard_1', 'shard_2'])
+class ShardRoutingTestCase(SimpleTestCase):
+    def test_shard_is_stable_and_balanced(self):
+        account_ids = [uuid.uuid4() for _ in range(3000)]
+        shards = [get_shard(account_id) for account_id in account_ids]
+        self.assertEqual(shards, [get_shard(str(account_id)) for account_id in account_ids])
+
+        counts = Counter(shards)
+        self.assertEqual(set(counts), {'shard_0', 'shard_1', 'shard_2'})
+        self.assertTrue(all(800 < count < 1200 for count in counts.values()))
+
+    def test_router_uses_the_account_shard(self):
+        router = TransactionShardRouter()
+        account_id = uuid.uuid4()
+        transaction = Transaction(account_id=account_id)
+        self.assertEqual(router.db_for_write(Transaction, instance=transaction), get_shard(account_id))
+        self.assertEqual(router.db_for_read(OutboxEvent, instance=OutboxEvent(account_id=account_id)), get_shard(account_id))
+        self.assertIsNone(router.db_for_write(InvestmentAccount, instance=InvestmentAccount()))
+        self.assertEqual(router.db_for_read(Transaction, instance=InvestmentAccount(pk=account_id)), get_shard(account_id))
+        self.assertIsNone(router.db_for_read(Transaction))
+
+    def test_scatter_runs_on_every_shard(self):
+        self.assertEqual(scatter(lambda alias: alias.upper()), ['SHARD_0', 'SHARD_1', 'SHARD_2'])
+
+
+class DeferredAccountRoutingTestCase(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        self.transaction = Transaction.objects.create(user=self.user, account=self.account, amount=100, transaction_type='credit')
+
+    def test_deferred_account_id_is_not_loaded_by_the_router(self):
+        transaction = Transaction.objects.for_account(self.account.id).only('id').get(pk=self.transaction.pk)
+        with self.assertNumQueries(0):
+            self.assertIsNone(TransactionShardRouter().db_for_read(Transaction, instance=transaction))
+        self.assertEqual(transaction.amount, 100)
+        self.assertEqual(transaction.account_id, self.account.id)
+
+
+# shard_0 and shard_1 are SQLite databases in the test settings
+@override_settings(TRANSACTION_SHARDS=['shard_0', 'shard_1'])
+class ShardedTransactionsTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(email='admin@gmail.com', password='Admin123')
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+
+        # one account on each of two different shards
+        self.accounts = {}
+        index = 0
+        while len(self.accounts) < 2:
+            account = InvestmentAccount.objects.create(name=f'Investment Account {index}', permission=InvestmentAccount.FULL_CRUD)
+            self.accounts.setdefault(get_shard(account.id), account)
+            index += 1
+
+    def test_transactions_live_on_their_account_shard(self):
+        for alias, account in self.accounts.items():
+            transaction = Transaction.objects.create(user=self.user, account=account, amount=100, transaction_type='credit')
+            self.assertEqual(transaction._state.db, alias)
+            self.assertTrue(Transaction.objects.using(alias).filter(pk=transaction.pk).exists())
+            self.assertTrue(OutboxEvent.objects.using(alias).filter(transaction_id=transaction.pk).exists())
+            self.assertEqual(Transaction.objects.for_account(account.id).count(), 1)
+
+            transaction.amount = 150
+            transaction.save()
+            self.assertEqual(Transaction.objects.for_account(account.id).get().amount, 150)
+
+        self.assertFalse(Transaction.objects.using('default').exists())
+        for account in self.accounts.values():
+            self.assertEqual(account.transactions.count(), 1)
+
+    def test_api_create_goes_to_the_account_shard(self):
+        permission, _ = Permission.objects.get_or_create(
+            codename='can_crud_transactions',
+            name='Can CRUD transactions',
+            content_type=ContentType.objects.get_for_model(InvestmentAccount)
+        )
+        group = Group.objects.create(name='crud_group')
+        group.permissions.add(permission)
+        self.user.groups.add(group)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for alias, account in self.accounts.items():
+            UserInvestmentAccount.objects.create(user=self.user, investment_account=account)
+            response = client.post(f'/api/investment-accounts/{account.id}/transactions/', {
+                'user': self.user.id, 'account': account.id, 'amount': 100, 'transaction_type': 'credit',
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertTrue(Transaction.objects.using(alias).filter(pk=response.data['id']).exists())
+
+            response = client.get(f'/api/investment-accounts/{account.id}/transactions/')
+            self.assertEqual(len(response.data), 1)
+        self.assertFalse(Transaction.objects.using('default').exists())
+
+    def test_deletes_cascade_to_the_shards(self):
+        other_user = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        (alias, account), (other_alias, other_account) = self.accounts.items()
+        for user in (self.user, other_user):
+            for shard_account in (account, other_account):
+                Transaction.objects.create(user=user, account=shard_account, amount=100, transaction_type='credit')
+
+        account.delete()
+        self.assertFalse(Transaction.objects.using(alias).exists())
+        self.assertEqual(Transaction.objects.using(other_alias).count(), 2)
+        # tombstones for the deleted transactions
+        self.assertEqual(OutboxEvent.objects.using(alias).filter(event_type=OutboxEvent.DELETED).count(), 2)
+
+        other_user.delete()
+        self.assertEqual(list(Transaction.objects.using(other_alias).values_list('user_id', flat=True)), [self.user.id])
+
+    def test_admin_report_gathers_every_shard(self):
+        for account in self.accounts.values():
+            Transaction.objects.create(user=self.user, account=account, amount=100, transaction_type='credit')
+            Transaction.objects.create(user=self.user, account=account, amount=30, transaction_type='debit')
+
+        client = APIClient()
+        client.force_authenticate(self.admin_user)
+        response = client.get(f'/api/admin/users/{self.user.id}/transactions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['transactions']), 4)
+        self.assertEqual(response.data['total_balance'], 140)
+
+    def create_transactions(self):
+        # 100 credit and 30 debit on each account, ten days ago
+        for account in self.accounts.values():
+            for amount, transaction_type in ((100, 'credit'), (30, 'debit')):
+                transaction = Transaction.objects.create(user=self.user, account=account, amount=amount, transaction_type=transaction_type)
+                Transaction.objects.using(get_shard(account.id)).filter(pk=transaction.pk).update(
+                    created_at=timezone.now() - timedelta(days=10)
+                )
+
+    def test_balances_and_checkpoints_gather_every_shard(self):
+        self.create_transactions()
+        self.assertEqual(balance_as_of(timezone.now(), user=self.user)['balance'], 140)
+
+        create_checkpoints(as_of=timezone.now() - timedelta(days=1))
+        self.assertEqual(BalanceCheckpoint.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(balance_as_of(timezone.now(), user=self.user)['balance'], 140)
+        for account in self.accounts.values():
+            self.assertEqual(balance_as_of(timezone.now(), account=account)['balance'], 70)
+
+    def test_statements_and_reconciliation_gather_every_shard(self):
+        self.create_transactions()
+        month = (timezone.now() - timedelta(days=10)).date().replace(day=1)
+        generate_statements(month, [account.id for account in self.accounts.values()], workers=1)
+        self.assertEqual(
+            sorted(AccountStatement.objects.filter(user=self.user).values_list('closing_balance', flat=True)), [70, 70]
+        )
+
+        create_checkpoints(as_of=timezone.now() - timedelta(days=1))
+        run = reconcile(ReconciliationRun.objects.create(chunk_size=1), workers=1)
+        self.assertEqual(run.accounts_checked, InvestmentAccount.objects.count())
+        self.assertEqual(run.mismatches, [])
+
+    def test_analytics_and_exports_gather_every_shard(self):
+        self.create_transactions()
+        for metric in ('balance', 'peak_balance'):
+            results = top_rankings(metric, by='user', start_date=date.today() - timedelta(days=30))
+            self.assertEqual([(result['user'], result['value']) for result in results], [(self.user.id, 140 if metric == 'balance' else 170)])
+
+        results = top_rankings('inflow', by='account')
+        self.assertEqual([result['value'] for result in results], [100, 100])
+
+        if exports.pa is not None:
+            batches = list(exports.iter_record_batches(exports.get_export_queryset(users=[self.user.id]), batch_size=3))
+            self.assertEqual(sum(batch.num_rows for batch in batches), 4)
+
+    def test_user_balance_series_merges_every_shard(self):
+        self.create_transactions()
+        series = balance_series(user_id=self.user.id, points=100)
+        self.assertEqual(series['count'], 4)
+        self.assertEqual(series['points'][-1]['balance'], 140)
+        self.assertEqual(sorted(point['balance'] for point in series['points']), [70, 100, 140, 170])
+
+        series = balance_series(user_id=self.user.id, points=100, start_date=date.today())
+        self.assertEqual((series['count'], series['opening_balance']), (0, 140))
@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from io import StringIO
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction, AccountStatement
+from investments_api.statements import generate_statements
+
+User = get_user_model()
+
+class AccountStatementTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        self.other_user = User.objects.create_user(first_name='Jane', last_name='Doe', email='janedoe@gmail.com', password='JaneDoe123')
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        UserInvestmentAccount.objects.create(user=self.user, investment_account=self.account)
+        UserInvestmentAccount.objects.create(user=self.other_user, investment_account=self.account)
+
+        self.create_transaction(datetime(2024, 1, 10), 500, 'credit')
+        self.create_transaction(datetime(2024, 2, 3), 200, 'debit')
+        self.create_transaction(datetime(2024, 2, 20), 50, 'credit')
+        self.create_transaction(datetime(2024, 3, 1), 999, 'credit')
+
+    def create_transaction(self, created_at, amount, transaction_type):
+        transaction = Transaction.objects.create(user=self.user, account=self.account, amount=amount, transaction_type=transaction_type)
+        Transaction.objects.filter(pk=transaction.pk).update(created_at=timezone.make_aware(created_at))
+
+    def test_generate_statements(self):
+        call_command('generate_statements', '--month', '2024-02', '--workers', '1', stdout=StringIO())
+
+        statement = AccountStatement.objects.get(user=self.user, month=date(2024, 2, 1))
+        self.assertEqual(statement.opening_balance, 500)
+        self.assertEqual((statement.total_credits, statement.total_debits), (50, 200))
+        self.assertEqual(statement.closing_balance, 350)
+        self.assertEqual([item['amount'] for item in statement.line_items], [200, 50])
+
+        # members without activity still get a statement
+        self.assertEqual(AccountStatement.objects.get(user=self.other_user).closing_balance, 0)
+
+        # the next month opens from the stored closing balance
+        generate_statements(date(2024, 3, 1), [self.account.id], workers=1)
+        self.assertEqual(AccountStatement.objects.get(user=self.user, month=date(2024, 3, 1)).closing_balance, 1349)
+
+    def test_statements_are_immutable(self):
+        generate_statements(date(2024, 2, 1), [self.account.id], workers=1)
+        statement = AccountStatement.objects.get(user=self.user)
+        statement.closing_balance = 0
+        with self.assertRaises(ValueError):
+            statement.save()
+
+        # regenerating leaves existing statements alone
+        generate_statements(date(2024, 2, 1), [self.account.id], workers=1)
+        self.assertEqual(AccountStatement.objects.get(user=self.user).closing_balance, 350)
+
+    def test_unfinished_month_is_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_statements', '--month', timezone.now().strftime('%Y-%m'), stdout=StringIO())
+
+    def test_statement_list(self):
+        generate_statements(date(2024, 2, 1), [self.account.id], workers=1)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get(f'/api/investment-accounts/{self.account.id}/statements/', {'month': '2024-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['closing_balance'], 350)
+        self.assertEqual(response.data[0]['month'], '2024-02')
+
+        outsider = User.objects.create_user(first_name='Sean', last_name='Smith', email='seansmith@gmail.com', password='SeanSmith123')
+        client.force_authenticate(user=outsider)
+        response = client.get(f'/api/investment-accounts/{self.account.id}/statements/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,82 @@
+import json
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction
+from investments_api.streams import hub, format_sse, get_backend
+
+User = get_user_model()
+
+class TransactionStreamTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        permission, _ = Permission.objects.get_or_create(
+            codename='can_crud_transactions',
+            name='Can CRUD transactions',
+            content_type=ContentType.objects.get_for_model(InvestmentAccount)
+        )
+        group = Group.objects.create(name='crud_group')
+        group.permissions.add(permission)
+        self.user.groups.add(group)
+
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        UserInvestmentAccount.objects.create(user=self.user, investment_account=self.account)
+        Transaction.objects.create(user=self.user, account=self.account, amount=100, transaction_type='credit')
+        self.url = reverse('transaction-stream', kwargs={'account_id': self.account.id})
+
+    async def test_stream_pushes_committed_transactions(self):
+        response = await self.async_client.get(self.url, {'token': str(AccessToken.for_user(self.user))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        snapshot = (await anext(events)).decode()
+        self.assertTrue(snapshot.startswith('event: balance\n'))
+        self.assertEqual(json.loads(snapshot.split('data: ')[1])['balance'], 100)
+        self.assertTrue(hub.has_subscribers(self.account.id))
+
+        def create_transaction():
+            with self.captureOnCommitCallbacks(execute=True):
+                return Transaction.objects.create(user=self.user, account=self.account, amount=30, transaction_type='debit')
+
+        tx = await sync_to_async(create_transaction)()
+        message = (await anext(events)).decode()
+        self.assertIn('event: transaction.created\n', message)
+        data = json.loads(message.split('data: ')[1])
+        self.assertEqual(data['transaction_id'], str(tx.id))
+        self.assertEqual(data['balance']['balance'], 70)
+
+        response.close()
+        self.assertFalse(hub.has_subscribers(self.account.id))
+
+    def test_publishes_ids_only_and_tolerates_failures(self):
+        backend = get_backend()
+        with mock.patch.object(backend, 'has_listeners', return_value=True), mock.patch.object(backend, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Transaction.objects.create(user=self.user, account=self.account, amount=30, transaction_type='debit', description='x' * 10000)
+            account_id, notice = publish.call_args.args
+            self.assertEqual(account_id, self.account.id)
+            self.assertEqual(set(notice), {'event_id'})
+
+            # the write has committed; a failed push is only logged
+            publish.side_effect = RuntimeError('payload string too long')
+            with self.assertLogs('django.test', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                tx = Transaction.objects.create(user=self.user, account=self.account, amount=30, transaction_type='debit')
+        self.assertTrue(Transaction.objects.filter(pk=tx.pk).exists())
+
+    async def test_stream_requires_token_and_membership(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        outsider = await User.objects.acreate(email='janedoe@gmail.com', first_name='Jane', last_name='Doe')
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Bearer {AccessToken.for_user(outsider)}'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_format_sse(self):
+        message = format_sse({'id': 7, 'event': 'transaction.deleted', 'data': '{"a": 1}\n{"b": 2}'})
+        self.assertEqual(message, 'id: 7\nevent: transaction.deleted\ndata: {"a": 1}\ndata: {"b": 2}\n\n')
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from investments_api.models import InvestmentAccount, UserInvestmentAccount
+from investments_api.throttling import TokenBucketStore, bucket_store, parse_rate
+
+User = get_user_model()
+
+class TokenBucketStoreTestCase(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.store = TokenBucketStore(max_entries=2, clock=lambda: self.now)
+
+    def test_burst_then_refill(self):
+        limits = [('user:1', 1, 2)]
+        self.assertEqual(self.store.consume(limits), 0)
+        self.assertEqual(self.store.consume(limits), 0)
+        self.assertEqual(self.store.consume(limits), 1)
+
+        self.now = 0.5
+        self.assertEqual(self.store.consume(limits), 0.5)
+        self.now = 1
+        self.assertEqual(self.store.consume(limits), 0)
+
+    def test_all_or_nothing_across_buckets(self):
+        self.assertEqual(self.store.consume([('account:a', 1, 1)]), 0)
+        # the account bucket is empty, so the user bucket keeps its token
+        self.assertEqual(self.store.consume([('user:1', 1, 1), ('account:a', 1, 1)]), 1)
+        self.assertEqual(self.store.consume([('user:1', 1, 1)]), 0)
+
+    def test_least_recently_used_buckets_are_evicted(self):
+        for key in ('a', 'b', 'c'):
+            self.store.consume([(key, 1, 1)])
+        self.assertEqual(list(self.store.buckets), ['b', 'c'])
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('60/min'), (60, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+        self.assertEqual(parse_rate('1000/day'), (1000, 86400))
+        for rate in ('60', '60/week', 'x/min', '60/'):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_rate(rate)
+
+
+@override_settings(TRANSACTION_WRITE_THROTTLE_RATES={'user': '2/min', 'account': '100/min'})
+class TransactionWriteThrottleTestCase(TestCase):
+    def setUp(self):
+        bucket_store.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(first_name='John', last_name='Doe', email='johndoe@gmail.com', password='JohnDoe123')
+        permission, _ = Permission.objects.get_or_create(
+            codename='can_crud_transactions',
+            name='Can CRUD transactions',
+            content_type=ContentType.objects.get_for_model(InvestmentAccount)
+        )
+        group = Group.objects.create(name='crud_group')
+        group.permissions.add(permission)
+        self.user.groups.add(group)
+
+        self.account = InvestmentAccount.objects.create(name='Investment Account 1', permission=InvestmentAccount.FULL_CRUD)
+        UserInvestmentAccount.objects.create(user=self.user, investment_account=self.account)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('transaction-list-create', kwargs={'account_id': self.account.id})
+
+    def create_transaction(self):
+        return self.client.post(self.url, data={
+            'user': self.user.id,
+            'account': self.account.id,
+            'amount': 100,
+            'transaction_type': 'credit'
+        })
+
+    def test_writes_are_throttled_with_retry_after(self):
+        self.assertEqual(self.create_transaction().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.create_transaction().status_code, status.HTTP_201_CREATED)
+
+        response = self.create_transaction()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn(int(response['Retry-After']), (29, 30))
+
+        # reads are not throttled
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
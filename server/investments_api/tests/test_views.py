@@ -1,10 +1,19 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from rest_framework.test import APIClient
 from rest_framework import status
 from investments_api.models import InvestmentAccount, UserInvestmentAccount, Transaction
 from datetime import datetime
+import json
+import unittest
+from investments_api.renderers import msgpack
+from investments_api.exports import pa, pq
+from django.core.management import call_command
+import tempfile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import io
 
 User = get_user_model()
 
@@ -111,6 +120,23 @@ class ViewsTestCase(TestCase):
         created_user_investment = UserInvestmentAccount.objects.get(user=self.normal_user, investment_account=self.investment_account_3)
         self.assertIn(str(created_user_investment.id), [account['id'] for account in response_list.data])
         
+    def test_user_investment_account_create_rejects_list_payload(self):
+        # lists go through the admin-only bulk endpoint and its row limit
+        response = self.client.post('/api/user-investment-accounts/', [
+            {'user': self.normal_user.email, 'investment_account': self.investment_account_3.name},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UserInvestmentAccount.objects.filter(user=self.normal_user, investment_account=self.investment_account_3).exists())
+
+    def test_user_investment_account_browsable_form_does_not_list_users(self):
+        for i in range(20):
+            User.objects.create_user(email=f'listed{i}@gmail.com', password='ListedPassword')
+
+        response = self.client.get('/api/user-investment-accounts/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('listed0@gmail.com', response.content.decode())
+
     # user investment detail
     def test_user_investment_account_detail_retrieve_update_destroy(self):
         # retrieve
@@ -145,4 +171,155 @@ class ViewsTestCase(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('Initial Deposit', [transaction['description'] for transaction in response.data['transactions']])
-        self.assertEqual(response.data['total_balance'], 400)
\ No newline at end of file
+        self.assertEqual(response.data['total_balance'], 400)
+    # bulk user provisioning
+    @override_settings(BULK_PROVISIONING_MIN_ITERATIONS=1000)
+    def test_user_bulk_create(self):
+        response = self.client.post('/api/users/bulk/', {
+            'iterations': 1000,
+            'users': [
+                {'email': 'bulk1@gmail.com', 'password': 'BulkPassword1', 'first_name': 'Bulk', 'last_name': 'One'},
+                {'email': 'uniqueuser@gmail.com', 'password': 'BulkPassword2'},
+                {'email': 'bulk1@gmail.com', 'password': 'BulkPassword3'},
+                {'email': 'not-an-email', 'password': ''},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error', 'error', 'error'])
+        self.assertIn('password', response.data['results'][3]['errors'])
+
+        user = User.objects.get(email='bulk1@gmail.com')
+        self.assertIn('$1000$', user.password)
+        self.assertTrue(user.check_password('BulkPassword1'))
+
+    def test_user_bulk_create_enforces_iteration_floor(self):
+        response = self.client.post('/api/users/bulk/', {
+            'iterations': 1,
+            'users': [{'email': 'bulk1@gmail.com', 'password': 'BulkPassword1'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('iterations', response.data)
+        self.assertFalse(User.objects.filter(email='bulk1@gmail.com').exists())
+
+    @override_settings(BULK_PROVISIONING_MAX_ROWS=2)
+    def test_user_bulk_create_limits_rows(self):
+        response = self.client.post('/api/users/bulk/', {
+            'users': [{'email': f'bulk{i}@gmail.com', 'password': 'BulkPassword1'} for i in range(3)],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('provision_users', response.data['users'][0])
+        self.assertFalse(User.objects.filter(email='bulk0@gmail.com').exists())
+
+    def test_user_bulk_create_admin_only(self):
+        self.client.force_authenticate(user=self.normal_user)
+        response = self.client.post('/api/users/bulk/', {'users': [{'email': 'bulk1@gmail.com', 'password': 'BulkPassword1'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    # bulk memberships
+    def test_user_investment_account_bulk_create(self):
+        other_user = User.objects.create_user(first_name='Other', last_name='User', email='otheruser@gmail.com', password='OtherPassword')
+
+        with self.assertNumQueries(8):
+            response = self.client.post('/api/user-investment-accounts/bulk/', {
+                'memberships': [
+                    {'user': self.normal_user.email, 'investment_account': self.investment_account_3.name},
+                    {'user': other_user.email, 'investment_account': self.investment_account_3.name},
+                    {'user': self.normal_user.email, 'investment_account': self.investment_account.name},
+                    {'user': 'missing@gmail.com', 'investment_account': self.investment_account.name},
+                ]
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'created', 'exists', 'error'])
+        self.assertTrue(UserInvestmentAccount.objects.filter(user=other_user, investment_account=self.investment_account_3).exists())
+        self.assertIn(self.view_group, other_user.groups.all())
+        self.assertIn(self.crud_group, self.normal_user.groups.all())
+
+    # transaction filters
+    def test_admin_user_transaction_list_filters(self):
+        response = self.client.get(
+            f'/api/admin/users/{self.normal_user.id}/transactions/',
+            {'transaction_type': 'credit', 'amount_min': 200}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([transaction['description'] for transaction in response.data['transactions']], ['Initial Deposit'])
+        self.assertEqual(response.data['total_balance'], 500)
+
+        response = self.client.get(f'/api/admin/users/{self.normal_user.id}/transactions/', {'amount_max': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    # renderers
+    def test_admin_user_transaction_list_columnar(self):
+        response = self.client.get(
+            f'/api/admin/users/{self.normal_user.id}/transactions/',
+            HTTP_ACCEPT='application/vnd.goinvest.columnar+json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(sorted(data['transactions']['amount']), [100, 500])
+        self.assertEqual(len(data['transactions']['id']), 2)
+        self.assertEqual(data['total_balance'], 400)
+
+    def test_investment_account_list_json(self):
+        response = self.client.get('/api/investment-accounts/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn(str(self.investment_account.id), [account['id'] for account in json.loads(response.content)])
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_admin_user_transaction_list_msgpack(self):
+        response = self.client.get(f'/api/admin/users/{self.normal_user.id}/transactions/', {'format': 'msgpack'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data['total_balance'], 400)
+        self.assertIn('Initial Deposit', [transaction['description'] for transaction in data['transactions']])
+
+
+    # arrow / parquet exports
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_admin_transaction_export_arrow(self):
+        response = self.client.get(
+            '/api/admin/transactions/export/',
+            {'account': [str(self.investment_account.id)], 'batch_size': 1},
+            HTTP_ACCEPT='application/vnd.apache.arrow.stream'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        table = pa.ipc.open_stream(b''.join(response.streaming_content)).read_all()
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(sorted(table.column('amount').to_pylist()), [100, 500])
+        self.assertEqual(set(table.column('user_id').to_pylist()), {str(self.normal_user.id)})
+
+        response = self.client.get('/api/admin/transactions/export/', {'account': 'not-a-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_export_transactions_command_parquet(self):
+        with tempfile.TemporaryDirectory() as output:
+            call_command(
+                'export_transactions', output, '--format', 'parquet', '--partition-by', 'account_id',
+                '--user', str(self.normal_user.id), '--batch-size', '1', stdout=io.StringIO()
+            )
+            table = pq.read_table(output)
+            self.assertEqual(table.num_rows, 2)
+            self.assertEqual(sum(table.column('amount').to_pylist()), 600)
+
+    # sparse fieldsets
+    def test_admin_user_transaction_list_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f'/api/admin/users/{self.normal_user.id}/transactions/',
+                {'fields': 'id,amount,unknown'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['transactions'][0]), {'id', 'amount'})
+        self.assertEqual(response.data['total_balance'], 400)
+        self.assertFalse(any('"description"' in query['sql'] for query in queries.captured_queries))
+
+    def test_user_and_investment_account_sparse_fields(self):
+        response = self.client.get('/api/users/', {'fields': 'id,email'})
+        self.assertEqual(set(response.data[0]), {'id', 'email'})
+
+        response = self.client.get(f'/api/investment-accounts/{self.investment_account.id}/', {'fields': 'name,users'})
+        self.assertEqual(set(response.data), {'name', 'users'})
+        self.assertEqual(response.data['users'][0]['user'], self.normal_user.email)
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_RATES = {'user': '60/min', 'account': '600/min'}
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    # DRF's "<requests>/<period>" format (period: s, sec, m, min, h, hour, d, day)
+    # -> (requests, seconds)
+    try:
+        num, period = rate.split('/')
+        return int(num), PERIODS[period[0]]
+    except (AttributeError, ValueError, IndexError, KeyError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}')
+
+
+class TokenBucketStore:
+    # Process-local bucket state, key -> (tokens, updated_at). Buckets are refilled
+    # lazily from the elapsed time when they are next touched, and the least recently
+    # used ones are evicted (an evicted bucket comes back full).
+    def __init__(self, max_entries=10000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, limits, cost=1):
+        # limits: [(key, tokens per second, capacity)]. Tokens are taken from every
+        # bucket or none; returns 0 when allowed, else the seconds until it would be.
+        with self.lock:
+            now = self.clock()
+            levels = []
+            for key, rate, capacity in limits:
+                tokens, updated_at = self.buckets.get(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated_at) * rate))
+
+            wait = max(
+                ((cost - tokens) / rate for tokens, (_, rate, _) in zip(levels, limits) if tokens < cost),
+                default=0,
+            )
+            for tokens, (key, _, _) in zip(levels, limits):
+                self.buckets[key] = (tokens if wait else tokens - cost, now)
+                self.buckets.move_to_end(key)
+
+            while len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+bucket_store = TokenBucketStore()
+
+
+# Per-user and per-account token buckets for transaction writes (POST only).
+# Rates use DRF's "<requests>/<period>" format; the request count is also the burst.
+class TransactionWriteThrottle(BaseThrottle):
+    methods = ('POST',)
+    store = bucket_store
+
+    def get_limits(self, request, view):
+        rates = {**DEFAULT_RATES, **getattr(settings, 'TRANSACTION_WRITE_THROTTLE_RATES', {})}
+        keys = {
+            'user': request.user.pk if request.user.is_authenticated else self.get_ident(request),
+            'account': view.kwargs.get('account_id'),
+        }
+
+        limits = []
+        for scope, ident in keys.items():
+            if rates.get(scope) is None or ident is None:
+                continue
+            num_requests, duration = parse_rate(rates[scope])
+            limits.append((f'{scope}:{ident}', num_requests / duration, num_requests))
+        return limits
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+        if request.method not in self.methods:
+            return True
+
+        limits = self.get_limits(request, view)
+        if limits:
+            self.wait_seconds = self.store.consume(limits)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
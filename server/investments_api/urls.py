@@ -13,18 +13,34 @@ urlpatterns = [
     path('groups/<int:pk>/', views.GroupsDetailView.as_view(), name='group-detail'),
 
     path('users/register/', UserCreate.as_view(), name='user-create'),
+    path('users/bulk/', views.UserBulkCreateView.as_view(), name='user-bulk-create'),
     path('users/', UserListView.as_view(), name='users-list'),
     path('users/<uuid:pk>/', UserDetailView.as_view(), name='user-detail'),
+    path('users/<uuid:user_id>/balance-series/', views.UserBalanceSeriesAPIView.as_view(), name='user-balance-series'),
 
     path('investment-accounts/register/', views.InvestmentAccountCreateView.as_view(), name='investment-account-create'),
     path('investment-accounts/', views.InvestmentAccountListView.as_view(), name='investment-account-list'),
+    path('investment-accounts/balances/', views.InvestmentAccountBalanceBatchAPIView.as_view(), name='investment-account-balances'),
     path('investment-accounts/<uuid:pk>/', InvestmentAccountDetailView.as_view(), name='investment-account-detail'),
 
     path('user-investment-accounts/', UserInvestmentAccountListCreateView.as_view(), name='user-investment-account-list-create'),
+    path('user-investment-accounts/bulk/', views.UserInvestmentAccountBulkCreateView.as_view(), name='user-investment-account-bulk-create'),
     path('user-investment-accounts/<uuid:pk>/', UserInvestmentAccountDetailView.as_view(), name='user-investment-account-detail'),
 
     path('admin/users/<uuid:user_id>/transactions/', AdminUserTransactionListAPIView.as_view(), name='admin-user-transactions'),
+    path('admin/users/<uuid:user_id>/transactions/reports/', views.AdminReportJobCreateAPIView.as_view(), name='admin-report-create'),
+    path('admin/reports/<uuid:pk>/', views.AdminReportJobDetailAPIView.as_view(), name='admin-report-detail'),
+    path('admin/reports/<uuid:pk>/download/', views.AdminReportJobDownloadAPIView.as_view(), name='admin-report-download'),
+    path('admin/profiles/<uuid:profile_id>/', views.AdminProfileDetailAPIView.as_view(), name='admin-profile-detail'),
+    path('admin/balances/', views.AdminBalanceAPIView.as_view(), name='admin-balances'),
+    path('admin/analytics/top/', views.AdminTopRankingAPIView.as_view(), name='admin-analytics-top'),
+    path('admin/transactions/export/', views.AdminTransactionExportAPIView.as_view(), name='admin-transaction-export'),
 
     path('investment-accounts/<uuid:account_id>/transactions/', TransactionListCreateAPIView.as_view(), name='transaction-list-create'),
+    path('investment-accounts/<uuid:account_id>/statements/', views.AccountStatementListAPIView.as_view(), name='account-statement-list'),
+    path('investment-accounts/<uuid:account_id>/transactions/search/', views.TransactionSearchAPIView.as_view(), name='transaction-search'),
+    path('investment-accounts/<uuid:account_id>/transactions/changes/', views.TransactionChangesAPIView.as_view(), name='transaction-changes'),
+    path('investment-accounts/<uuid:account_id>/balance-series/', views.AccountBalanceSeriesAPIView.as_view(), name='account-balance-series'),
+    path('investment-accounts/<uuid:account_id>/stream/', views.transaction_stream_view, name='transaction-stream'),
     path('investment-accounts/<uuid:account_id>/transactions/<uuid:pk>/', TransactionRetrieveUpdateDestroyAPIView.as_view(), name='transaction-detail'),
 ]
\ No newline at end of file
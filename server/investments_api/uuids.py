@@ -0,0 +1,32 @@
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    # RFC 9562 UUIDv7: a 48-bit Unix millisecond timestamp, a 12-bit counter and 62
+    # random bits. Keys sort by creation time, so new rows append to the right edge
+    # of the primary key index instead of landing on random pages. The counter keeps
+    # ids from one process strictly increasing within a millisecond (and across a
+    # clock step back); on overflow it borrows the next millisecond.
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # random start, leaving at least 2048 increments before overflow
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
@@ -1,17 +1,58 @@
+import json
+from django.conf import settings
 from django.contrib.auth.models import Group
-from rest_framework import generics, response, status
+from rest_framework import generics, response, status, views
+from django.db import transaction
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse, FileResponse, Http404, HttpResponse, JsonResponse
 from django.db.models import Sum, F, Case, When
 from django.utils import timezone
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, IsAuthenticatedOrReadOnly
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.pagination import PageNumberPagination
 from django.utils.dateparse import parse_date
-from .models import User, InvestmentAccount, UserInvestmentAccount, Transaction
+from .models import User, InvestmentAccount, UserInvestmentAccount, Transaction, AccountStatement, OutboxEvent, ReportJob
 from . import serializers
 from .serializers import (
     UserSerializer, InvestmentAccountSerializer, 
-    UserInvestmentAccountSerializer, TransactionSerializer
+    UserInvestmentAccountSerializer, TransactionSerializer,
+    get_requested_fields
 )
-from .permissions import TransactionPermission
+from django_filters.rest_framework import DjangoFilterBackend
+from .filters import TransactionFilter
+from .search import TransactionSearchResults
+from . import exports
+from .balances import balance_as_of, parse_as_of, get_account_balances
+from .statements import parse_month
+from .analytics import top_rankings
+from .series import balance_series
+from .reports import submit_report, get_reports_dir
+from .middleware import get_profiles_dir
+from .renderers import ORJSONRenderer, ArrowStreamRenderer
+from .permissions import TransactionPermission, can_read_transactions, get_readable_account_ids
+from .throttling import TransactionWriteThrottle
+from .routers import get_shard, scatter
+from .provisioning import provision_users
+from .outbox import stamp_events
+from .authentication import CachedJWTAuthentication, invalidate_cached_user
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .streams import hub, get_backend, get_account_totals, EventStream
+from .metrics import registry
+
+# narrows the SQL column list to the ?fields= requested from the serializer
+class SparseFieldsetQuerysetMixin:
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        requested = get_requested_fields(self.request)
+        if requested:
+            only = self.get_serializer_class().get_only_fields(requested)
+            if only:
+                queryset = queryset.only(*only)
+
+        return queryset
 
 # Groups
 class GroupsListCreateView(generics.ListCreateAPIView):
@@ -31,12 +72,49 @@ class UserCreate(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
 
-class UserListView(generics.ListAPIView):
+class UserBulkCreateView(generics.GenericAPIView):
+    queryset = User.objects.all()
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        rows = request.data.get('users')
+        iterations = request.data.get('iterations')
+
+        if not isinstance(rows, list) or not rows:
+            return response.Response({'users': ['Expected a non-empty list of users.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        # each password costs a full hash; larger imports go through the provision_users command
+        max_rows = getattr(settings, 'BULK_PROVISIONING_MAX_ROWS', 200)
+        if len(rows) > max_rows:
+            return response.Response(
+                {'users': [f'Ensure this list has at most {max_rows} users; import larger files with the provision_users command.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if iterations is not None and (not isinstance(iterations, int) or isinstance(iterations, bool) or iterations < 1):
+            return response.Response({'iterations': ['A positive integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # hashed in this worker: no process pool inside a web server
+            results = provision_users(rows, iterations=iterations, workers=1)
+        except ValueError as e:
+            return response.Response({'iterations': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        response_data = {
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }
+
+        return response.Response(response_data, status=status.HTTP_200_OK)
+
+class UserListView(SparseFieldsetQuerysetMixin, generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
+class UserDetailView(SparseFieldsetQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -47,42 +125,146 @@ class InvestmentAccountCreateView(generics.CreateAPIView):
     serializer_class = InvestmentAccountSerializer
     permission_classes = [IsAdminUser]
 
-class InvestmentAccountListView(generics.ListAPIView):
+class InvestmentAccountListView(SparseFieldsetQuerysetMixin, generics.ListAPIView):
     queryset = InvestmentAccount.objects.all()
     serializer_class = InvestmentAccountSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class InvestmentAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
+class InvestmentAccountDetailView(SparseFieldsetQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = InvestmentAccount.objects.all()
     serializer_class = InvestmentAccountSerializer
     permission_classes = [IsAdminUser]
 
+# balances of many accounts in one request (members with read access only)
+class InvestmentAccountBalanceBatchAPIView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = serializers.AccountBalanceBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        account_ids = list(dict.fromkeys(serializer.validated_data['accounts']))
+
+        # one permission resolution for the batch instead of TransactionPermission per account
+        readable = get_readable_account_ids(request.user, account_ids)
+        account_ids = [account_id for account_id in account_ids if account_id in readable]
+        balances = get_account_balances(account_ids)
+
+        return response.Response({
+            'results': [{'account': account_id, **balances[account_id]} for account_id in account_ids],
+        }, status=status.HTTP_200_OK)
+
 # User Investment Account Views
 class UserInvestmentAccountListCreateView(generics.ListCreateAPIView):
-    queryset = UserInvestmentAccount.objects.all()
+    queryset = UserInvestmentAccount.objects.select_related('user', 'investment_account')
     serializer_class = UserInvestmentAccountSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    
+
     def perform_create(self, serializer):
         user_investment_account = serializer.save()
 
         user = user_investment_account.user
         investment_account = user_investment_account.investment_account
 
-        if investment_account.permission == InvestmentAccount.VIEW:
-            group_name = 'view_group'
-        elif investment_account.permission == InvestmentAccount.FULL_CRUD:
-            group_name = 'crud_group'
-        elif investment_account.permission == InvestmentAccount.POST_ONLY:
-            group_name = 'create_group'
-        else:
-            group_name = None
+        group_name = InvestmentAccount.ACCESS_GROUPS.get(investment_account.permission)
 
         if group_name:
             group = Group.objects.get(name=group_name)
             user.groups.add(group)
             user.save()
 
+class UserInvestmentAccountBulkCreateView(generics.GenericAPIView):
+    queryset = UserInvestmentAccount.objects.all()
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        rows = request.data.get('memberships')
+
+        if not isinstance(rows, list) or not rows:
+            return response.Response({'memberships': ['Expected a non-empty list of memberships.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_rows = getattr(settings, 'BULK_MEMBERSHIPS_MAX_ROWS', 5000)
+        if len(rows) > max_rows:
+            return response.Response({'memberships': [f'Ensure this list has at most {max_rows} memberships.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict) or not isinstance(row.get('user'), str) or not isinstance(row.get('investment_account'), str):
+                results.append({'row': index, 'status': 'error', 'errors': ['Expected user email and investment_account name.']})
+            else:
+                results.append({'row': index, 'user': row['user'], 'investment_account': row['investment_account']})
+
+        valid = [result for result in results if 'status' not in result]
+
+        # two IN lookups instead of per-row slug lookups
+        users = {user.email: user for user in User.objects.filter(email__in={result['user'] for result in valid}).only('id', 'email')}
+        accounts = {
+            account.name: account
+            for account in InvestmentAccount.objects.filter(name__in={result['investment_account'] for result in valid}).only('id', 'name', 'permission')
+        }
+        groups = {group.name: group for group in Group.objects.filter(name__in=InvestmentAccount.ACCESS_GROUPS.values())}
+
+        pairs = {}
+        for result in valid:
+            user = users.get(result['user'])
+            account = accounts.get(result['investment_account'])
+            errors = []
+            if user is None:
+                errors.append(f'User {result["user"]} does not exist.')
+            if account is None:
+                errors.append(f'Investment account {result["investment_account"]} does not exist.')
+
+            if errors:
+                result.update(status='error', errors=errors)
+            else:
+                pairs.setdefault((user.pk, account.pk), []).append(result)
+
+        existing = set()
+        if pairs:
+            existing = set(UserInvestmentAccount.objects.filter(
+                user__in={user_id for user_id, _ in pairs},
+                investment_account__in={account_id for _, account_id in pairs},
+            ).values_list('user_id', 'investment_account_id'))
+
+        accounts_by_id = {account.pk: account for account in accounts.values()}
+        memberships = []
+        user_groups = set()
+        for (user_id, account_id), pair_results in pairs.items():
+            account = accounts_by_id[account_id]
+            group = groups.get(InvestmentAccount.ACCESS_GROUPS.get(account.permission))
+            if group is not None:
+                user_groups.add((user_id, group.pk))
+
+            if (user_id, account_id) in existing:
+                status_name = 'exists'
+            else:
+                status_name = 'created'
+                memberships.append(UserInvestmentAccount(user_id=user_id, investment_account_id=account_id))
+
+            pair_results[0]['status'] = status_name
+            for result in pair_results[1:]:
+                result['status'] = 'exists'
+
+        UserGroup = User.groups.through
+        with transaction.atomic():
+            UserInvestmentAccount.objects.bulk_create(memberships, ignore_conflicts=True)
+            UserGroup.objects.bulk_create(
+                [UserGroup(user_id=user_id, group_id=group_id) for user_id, group_id in user_groups],
+                ignore_conflicts=True,
+            )
+
+        # bulk_create skips m2m_changed, so evict cached users here
+        for user_id in {user_id for user_id, _ in user_groups}:
+            invalidate_cached_user(user_id)
+
+        response_data = {
+            'created': sum(1 for result in results if result['status'] == 'created'),
+            'existing': sum(1 for result in results if result['status'] == 'exists'),
+            'failed': sum(1 for result in results if result['status'] == 'error'),
+            'results': results,
+        }
+
+        return response.Response(response_data, status=status.HTTP_200_OK)
+
 class UserInvestmentAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = UserInvestmentAccount.objects.all()
     serializer_class = UserInvestmentAccountSerializer
@@ -92,14 +274,7 @@ class UserInvestmentAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
         user = instance.user
         investment_account = instance.investment_account
 
-        if investment_account.permission == InvestmentAccount.VIEW:
-            group_name = 'view_group'
-        elif investment_account.permission == InvestmentAccount.FULL_CRUD:
-            group_name = 'crud_group'
-        elif investment_account.permission == InvestmentAccount.POST_ONLY:
-            group_name = 'create_group'
-        else:
-            group_name = None
+        group_name = InvestmentAccount.ACCESS_GROUPS.get(investment_account.permission)
 
         if group_name:
             try:
@@ -112,13 +287,16 @@ class UserInvestmentAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
         super().perform_destroy(instance)
 
 # Transaction Views
-class TransactionListCreateAPIView(generics.ListCreateAPIView):
+class TransactionListCreateAPIView(SparseFieldsetQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated, TransactionPermission]
+    throttle_classes = [TransactionWriteThrottle]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionFilter
 
     def get_queryset(self):
         account_id = self.kwargs.get('account_id')
-        return Transaction.objects.filter(account=account_id)
+        return Transaction.objects.for_account(account_id)
 
     def create(self, request, *args, **kwargs):
         account_id = self.kwargs.get('account_id')
@@ -126,18 +304,151 @@ class TransactionListCreateAPIView(generics.ListCreateAPIView):
             raise PermissionDenied("You do not have permission to make transactions in this account.")
         return super().create(request, *args, **kwargs)
 
-class TransactionRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class TransactionRetrieveUpdateDestroyAPIView(SparseFieldsetQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [TransactionPermission]
 
     def get_queryset(self):
         account_id = self.kwargs.get('account_id')
-        return Transaction.objects.filter(account_id=account_id)
+        return Transaction.objects.for_account(account_id)
     
+# full-text search over transaction descriptions
+class TransactionSearchPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+class TransactionSearchAPIView(generics.ListAPIView):
+    serializer_class = TransactionSerializer
+    permission_classes = [IsAuthenticated, TransactionPermission]
+    pagination_class = TransactionSearchPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This query parameter is required.']})
+
+        account_id = self.kwargs.get('account_id')
+        return TransactionSearchResults(account_id, query, using=get_shard(account_id))
+
+# incremental sync: transaction changes after a cursor, read from the outbox
+class TransactionChangesAPIView(generics.ListAPIView):
+    serializer_class = serializers.TransactionChangeSerializer
+    permission_classes = [IsAuthenticated, TransactionPermission]
+    default_limit = 500
+    max_limit = 1000
+
+    def get_int_param(self, name, default, minimum):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: ['A valid integer is required.']})
+        if value < minimum:
+            raise ValidationError({name: [f'Ensure this value is greater than or equal to {minimum}.']})
+        return value
+
+    def list(self, request, *args, **kwargs):
+        account_id = self.kwargs.get('account_id')
+        since = self.get_int_param('since', 0, 0)
+        limit = min(self.get_int_param('limit', self.default_limit, 1), self.max_limit)
+
+        # The cursor is the commit-ordered sequence, not the id: ids are assigned at
+        # insert and commit in any order. Events are stamped here (and by relay_outbox)
+        # only once committed, so a change that commits late gets a sequence above every
+        # cursor already handed out instead of below it. Unstamped events are not listed.
+        alias = get_shard(account_id)
+        stamp_events(using=alias)
+        events = list(
+            OutboxEvent.objects.using(alias)
+            .filter(account_id=account_id, sequence__gt=since)
+            .order_by('sequence')[:limit + 1]
+        )
+        has_more = len(events) > limit
+        events = events[:limit]
+
+        return response.Response({
+            'results': self.get_serializer(events, many=True).data,
+            'next_cursor': events[-1].sequence if events else since,
+            'has_more': has_more,
+        })
+
+# cumulative balance downsampled to a fixed number of points, whatever the history length
+class AccountBalanceSeriesAPIView(views.APIView):
+    permission_classes = [IsAuthenticated, TransactionPermission]
+
+    def get(self, request, account_id, *args, **kwargs):
+        serializer = serializers.BalanceSeriesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        series = balance_series(
+            account_id=account_id,
+            points=params['points'],
+            method=params['method'],
+            start_date=params.get('start_date'),
+            end_date=params.get('end_date'),
+        )
+
+        return response.Response({'account': account_id, 'method': params['method'], **series}, status=status.HTTP_200_OK)
+
+# the same series over a user's own transactions, across their accounts (and shards)
+class UserBalanceSeriesAPIView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, user_id, *args, **kwargs):
+        if not request.user.is_staff and request.user.pk != user_id:
+            raise PermissionDenied('You can only view your own balance.')
+
+        serializer = serializers.UserBalanceSeriesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        series = balance_series(
+            account_id=params.get('account'),
+            user_id=user_id,
+            points=params['points'],
+            method=params['method'],
+            start_date=params.get('start_date'),
+            end_date=params.get('end_date'),
+        )
+
+        return response.Response(
+            {'user': user_id, 'account': params.get('account'), 'method': params['method'], **series},
+            status=status.HTTP_200_OK,
+        )
+
+# precomputed monthly statements (admins see every member, members their own)
+class AccountStatementListAPIView(generics.ListAPIView):
+    serializer_class = serializers.AccountStatementSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        account_id = self.kwargs.get('account_id')
+        queryset = AccountStatement.objects.filter(account=account_id).select_related('user').order_by('-month')
+
+        if not self.request.user.is_staff:
+            if not UserInvestmentAccount.objects.filter(user=self.request.user, investment_account=account_id).exists():
+                raise PermissionDenied(detail='You are not a member of this investment account.')
+            queryset = queryset.filter(user=self.request.user)
+
+        month = self.request.query_params.get('month')
+        if month:
+            try:
+                queryset = queryset.filter(month=parse_month(month))
+            except ValueError as e:
+                raise ValidationError({'month': [str(e)]})
+
+        return queryset
+
 # admin (user transactions & date range filter)
-class AdminUserTransactionListAPIView(generics.ListAPIView):
+class AdminUserTransactionListAPIView(SparseFieldsetQuerysetMixin, generics.ListAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionFilter
 
     def get_queryset(self):
         user_id = self.kwargs.get('user_id')
@@ -158,28 +469,229 @@ class AdminUserTransactionListAPIView(generics.ListAPIView):
             end_date = timezone.make_aware(timezone.datetime.combine(end_date, timezone.datetime.max.time()))
             queryset = queryset.filter(created_at__lte=end_date)
 
+        as_of = self.get_as_of()
+        if as_of:
+            queryset = queryset.filter(created_at__lte=as_of)
+
         return queryset
 
+    def get_as_of(self):
+        as_of = self.request.query_params.get('as_of')
+        if not as_of:
+            return None
+
+        try:
+            return parse_as_of(as_of)
+        except ValueError as e:
+            raise ValidationError({'as_of': [str(e)]})
+
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
 
-        # total balance
-        balance_aggregation = queryset.aggregate(
-            total_credits=Sum(Case(
-                When(transaction_type='credit', then=F('amount')),
-                default=0,
-            )),
-            total_debits=Sum(Case(
-                When(transaction_type='debit', then=F('amount')),
-                default=0,
-            ))
-        )
+        # a user's transactions are spread over the shards of their accounts
+        def report(alias):
+            shard_queryset = queryset.using(alias)
+            balance_aggregation = shard_queryset.aggregate(
+                total_credits=Sum(Case(
+                    When(transaction_type='credit', then=F('amount')),
+                    default=0,
+                )),
+                total_debits=Sum(Case(
+                    When(transaction_type='debit', then=F('amount')),
+                    default=0,
+                ))
+            )
+            return list(shard_queryset), balance_aggregation
+
+        results = scatter(report)
+        transactions = [transaction for rows, _ in results for transaction in rows]
+        if len(results) > 1:
+            transactions.sort(key=lambda transaction: (transaction.created_at, transaction.id))
 
-        total_balance = (balance_aggregation['total_credits'] or 0) - (balance_aggregation['total_debits'] or 0)
+        # total balance
+        total_balance = sum((totals['total_credits'] or 0) - (totals['total_debits'] or 0) for _, totals in results)
 
         response_data = {
-            'transactions': self.get_serializer(queryset, many=True).data,
+            'transactions': self.get_serializer(transactions, many=True).data,
             'total_balance': total_balance
         }
 
-        return response.Response(response_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        # full-history balance at as_of, from checkpoints
+        as_of = self.get_as_of()
+        if as_of:
+            response_data['as_of_balance'] = balance_as_of(as_of, user=self.kwargs.get('user_id'))
+
+        return response.Response(response_data, status=status.HTTP_200_OK)
+
+# admin report jobs: large reports are computed by run_report_worker and downloaded as a file
+class AdminReportJobCreateAPIView(views.APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, user_id, *args, **kwargs):
+        get_object_or_404(User, pk=user_id)
+        serializer = serializers.ReportJobRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job, created = submit_report(user_id, serializer.data, requested_by=request.user)
+        data = serializers.ReportJobSerializer(job, context={'request': request}).data
+        headers = {'Location': reverse('admin-report-detail', kwargs={'pk': job.pk})}
+        return response.Response(data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK, headers=headers)
+
+class AdminReportJobDetailAPIView(generics.RetrieveAPIView):
+    queryset = ReportJob.objects.all()
+    serializer_class = serializers.ReportJobSerializer
+    permission_classes = [IsAdminUser]
+
+class AdminReportJobDownloadAPIView(views.APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = get_object_or_404(ReportJob, pk=pk)
+        if job.status != ReportJob.COMPLETED:
+            return response.Response({'detail': f'The report is {job.status}.'}, status=status.HTTP_409_CONFLICT)
+
+        path = get_reports_dir() / job.result_file
+        if not path.exists():
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name, content_type='application/json')
+
+# admin (point-in-time balances)
+class AdminBalanceAPIView(views.APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        serializer = serializers.BalanceQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        balance = balance_as_of(
+            params.get('as_of') or timezone.now(),
+            user=params.get('user'),
+            account=params.get('account'),
+        )
+
+        return response.Response(balance, status=status.HTTP_200_OK)
+
+# admin top-N accounts/users by balance, flows or transaction count
+class AdminTopRankingAPIView(views.APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        serializer = serializers.TopRankingQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        results = top_rankings(
+            params['metric'],
+            by=params['by'],
+            start_date=params.get('start_date'),
+            end_date=params.get('end_date'),
+            limit=params['limit'],
+        )
+
+        return response.Response({'metric': params['metric'], 'by': params['by'], 'results': results}, status=status.HTTP_200_OK)
+
+# admin (arrow export for analytics)
+class AdminTransactionExportAPIView(views.APIView):
+    permission_classes = [IsAdminUser]
+    renderer_classes = [ArrowStreamRenderer, ORJSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        if exports.pa is None:
+            return response.Response({'detail': 'pyarrow is not installed.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        serializer = serializers.TransactionExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = exports.get_export_queryset(
+            accounts=params.get('account'),
+            users=params.get('user'),
+            start_date=params.get('start_date'),
+            end_date=params.get('end_date'),
+        )
+
+        stream = StreamingHttpResponse(
+            exports.iter_arrow_stream(queryset, params['batch_size']),
+            content_type=ArrowStreamRenderer.media_type,
+        )
+        stream['Content-Disposition'] = 'attachment; filename="transactions.arrows"'
+        return stream
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # errors are reported as JSON whatever was negotiated
+        if not isinstance(response, StreamingHttpResponse):
+            request.accepted_renderer = ORJSONRenderer()
+            request.accepted_media_type = ORJSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# admin (request profiles captured by ProfilingMiddleware)
+class AdminProfileDetailAPIView(views.APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id, *args, **kwargs):
+        profiles_dir = get_profiles_dir()
+
+        if request.query_params.get('download'):
+            path = profiles_dir / f'{profile_id}.prof'
+            if not path.exists():
+                raise Http404
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+        path = profiles_dir / f'{profile_id}.json'
+        if not path.exists():
+            raise Http404
+
+        return response.Response(json.loads(path.read_text()), status=status.HTTP_200_OK)
+
+
+# Prometheus scrape endpoint (optionally protected by METRICS_TOKEN as a bearer token)
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Live account events over Server-Sent Events (served by backend/asgi.py).
+# EventSource can't set headers, so the JWT may also be passed as ?token=.
+def get_stream_user(request):
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get('token', '').encode()
+    if not raw_token:
+        return None
+
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def transaction_stream_view(request, account_id):
+    user = await sync_to_async(get_stream_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if not await sync_to_async(can_read_transactions)(user, account_id):
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=status.HTTP_403_FORBIDDEN)
+
+    get_backend().start()
+    # subscribe before reading the balance so no change falls in between
+    subscription = hub.subscribe(account_id)
+    try:
+        totals = await sync_to_async(get_account_totals)(account_id)
+    except Exception:
+        subscription.close()
+        raise
+    stream = EventStream(
+        subscription,
+        initial=[{'event': 'balance', 'data': json.dumps(totals)}],
+        heartbeat=getattr(settings, 'STREAM_HEARTBEAT', 15),
+    )
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response